@@ -0,0 +1,167 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Sequence
+
+import duckdb
+import polars as pl
+
+from charts import (
+    anuncios_by_property,
+    discourse_analysis,
+    graphical_analysis,
+    property_histogram,
+    property_table,
+    veiculacoes_by_property,
+)
+from data_processing import gold_db_path
+from queries import queries
+
+try:
+    import vl_convert as vlc
+except ImportError:
+    vlc = None
+
+export_dir = Path("exports")
+
+table_writers = {
+    "parquet": pl.DataFrame.write_parquet,
+    "csv": pl.DataFrame.write_csv,
+    "json": pl.DataFrame.write_json,
+}
+table_formats = tuple(table_writers)
+image_formats = ("svg", "png")
+
+
+def export_property(
+    df_properties: pl.DataFrame,
+    indicators: dict[str, int],
+    prop: list,
+    out_dir: Path,
+    formats: Sequence[str],
+) -> tuple[int, list[tuple[str, dict]]]:
+    """Writes the aggregates of one property and returns their chart specs by file stem."""
+    column, title, show_percentage, invert_axis, top_k = (prop + [None] * 5)[:5]
+    df_anuncios = anuncios_by_property(df_properties, column)
+    df_veiculacoes = veiculacoes_by_property(df_properties, column)
+    tables = {
+        column: property_table(df_properties, column, title),
+        f"{column}_anuncios": df_anuncios,
+        f"{column}_veiculacoes": df_veiculacoes,
+    }
+    for name, df in tables.items():
+        for fmt in formats:
+            table_writers[fmt](df, out_dir / "tabelas" / f"{name}.{fmt}")
+
+    charts = {
+        f"{column}_anuncios": property_histogram(
+            df_anuncios,
+            column,
+            "Anúncios",
+            indicators["anuncios_analisados"],
+            title,
+            show_percentage,
+            invert_axis,
+            top_k,
+        ),
+        f"{column}_veiculacoes": property_histogram(
+            df_veiculacoes,
+            column,
+            "Veiculações",
+            indicators["veiculacoes"],
+            title,
+            show_percentage,
+            invert_axis,
+            top_k,
+        ),
+    }
+    return len(tables) * len(formats), [
+        (name, chart.to_dict()) for name, chart in charts.items()
+    ]
+
+
+def render_image(spec: dict, path: Path) -> None:
+    if path.suffix == ".svg":
+        path.write_text(vlc.vegalite_to_svg(spec))
+    else:
+        path.write_bytes(vlc.vegalite_to_png(spec, scale=2))
+
+
+def export_all(
+    out_dir: Path = export_dir,
+    formats: Sequence[str] = table_formats,
+    images: Sequence[str] = image_formats,
+    workers: int | None = None,
+) -> tuple[int, int]:
+    """Exports the tables and charts of every property in the discourse and graphical analyses.
+
+    Returns the number of tables and images written."""
+    if images and vlc is None:
+        print(
+            "vl-convert-python não está instalado (instale o extra `export`); "
+            "os gráficos não serão exportados."
+        )
+        images = ()
+
+    (out_dir / "tabelas").mkdir(parents=True, exist_ok=True)
+    (out_dir / "graficos").mkdir(parents=True, exist_ok=True)
+
+    with duckdb.connect(str(gold_db_path), read_only=True) as con:
+        df_properties = con.sql(queries["properties"]).pl()
+        indicators = con.sql(queries["indicators"]).pl().row(0, named=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(
+            executor.map(
+                lambda prop: export_property(
+                    df_properties, indicators, prop, out_dir, formats
+                ),
+                discourse_analysis + graphical_analysis,
+            )
+        )
+    n_tables = sum(n for n, _ in results)
+    jobs = [
+        (spec, out_dir / "graficos" / f"{name}.{fmt}")
+        for _, specs in results
+        for name, spec in specs
+        for fmt in images
+    ]
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render_image, *zip(*jobs)))
+    return n_tables, len(jobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exporta as tabelas e os gráficos de cada propriedade sem o Streamlit."
+    )
+    parser.add_argument("--out-dir", type=Path, default=export_dir)
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=table_formats,
+        default=list(table_formats),
+        help="formatos das tabelas",
+    )
+    parser.add_argument(
+        "--images",
+        nargs="*",
+        choices=image_formats,
+        default=list(image_formats),
+        help="formatos dos gráficos (requer vl-convert-python)",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n_tables, n_images = export_all(
+        args.out_dir, args.formats, args.images, args.workers
+    )
+    print(
+        f"Exportadas {n_tables} tabelas e {n_images} imagens "
+        f"em {time.perf_counter() - start:.1f}s"
+    )
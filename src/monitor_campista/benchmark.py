@@ -0,0 +1,243 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import duckdb
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from chart_cache import to_vega_lite_spec
+from charts import (
+    anuncios_by_property,
+    df_to_histogram,
+    df_to_histogram_count_by_x,
+    discourse_analysis,
+    graphical_analysis,
+    property_histogram,
+    veiculacoes_by_property,
+)
+from data_processing import gold_db_path
+from queries import queries, section_queries
+
+dashboard_path = Path(__file__).with_name("dashboard.py")
+baseline_path = Path("benchmarks/baseline.json")
+groups = ["queries", "charts", "render"]
+
+
+def summarize(timings: list[float]) -> dict:
+    """Count, mean and p50/p95/p99 of a list of timings in milliseconds."""
+    cuts = (
+        statistics.quantiles(timings, n=100, method="inclusive")
+        if len(timings) > 1
+        else timings * 99
+    )
+    return {
+        "n": len(timings),
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": cuts[49],
+        "p95_ms": cuts[94],
+        "p99_ms": cuts[98],
+    }
+
+
+def status_kib(field: str) -> int:
+    """A memory field of /proc/self/status in KiB (0 where it is unavailable)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def rss_growth_kib(run: Callable[[], object]) -> int:
+    """How far one call of run raises the resident set size of the process.
+
+    The peak (VmHWM) is reset through /proc/self/clear_refs first, so it covers the
+    memory allocated by DuckDB, Arrow and Polars, which tracemalloc does not see."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    before = status_kib("VmRSS")
+    run()
+    return max(status_kib("VmHWM") - before, 0)
+
+
+def measure(run: Callable[[], object], repeat: int, warmup: int = 1) -> dict:
+    """Times repeat calls after warmup, then measures the RSS growth of one extra call."""
+    for _ in range(warmup):
+        run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {**summarize(timings), "rss_kib": rss_growth_kib(run)}
+
+
+def query_benchmarks(con: duckdb.DuckDBPyConnection) -> dict[str, Callable]:
+    return {
+        f"query:{name}": lambda sql=sql: con.sql(sql).pl()
+        for name, sql in queries.items()
+    }
+
+
+def chart_benchmarks(con: duckdb.DuckDBPyConnection) -> dict[str, Callable]:
+    frames = {name: con.sql(sql).pl() for name, sql in queries.items()}
+    indicators = frames["indicators"].row(0, named=True)
+    properties = [
+        (prop + [None] * 5)[:5] for prop in discourse_analysis + graphical_analysis
+    ]
+
+    def property_to_histogram(by_property, count_col, total):
+        for column, title, show_percentage, invert_axis, top_k in properties:
+            to_vega_lite_spec(
+                property_histogram(
+                    by_property(frames["properties"], column),
+                    column,
+                    count_col,
+                    total,
+                    title,
+                    show_percentage,
+                    invert_axis,
+                    top_k,
+                )
+            )
+
+    return {
+        "chart:df_to_histogram": lambda: to_vega_lite_spec(
+            df_to_histogram(frames["pages_per_edition"], "Total de Páginas", "Edições")
+        ),
+        "chart:df_to_histogram_count_by_x": lambda: to_vega_lite_spec(
+            df_to_histogram_count_by_x(
+                frames["ailments_count_per_ad"],
+                "molestias",
+                "Contagem de moléstias",
+                "Anúncios",
+            )
+        ),
+        "chart:property_to_histogram_by_anuncios": lambda: property_to_histogram(
+            anuncios_by_property, "Anúncios", indicators["anuncios_analisados"]
+        ),
+        "chart:property_to_histogram_by_veiculacoes": lambda: property_to_histogram(
+            veiculacoes_by_property, "Veiculações", indicators["veiculacoes"]
+        ),
+    }
+
+
+def render_benchmarks() -> dict[str, Callable]:
+    """Reruns of each tab through AppTest, warm and after clearing the cached resources."""
+    at = AppTest.from_file(str(dashboard_path), default_timeout=120)
+    at.run()
+
+    def render(section: str, cold: bool):
+        if cold:
+            st.cache_resource.clear()
+        at.get("button_group")[0].set_value([section]).run()
+        if at.exception:
+            raise RuntimeError(f"falha ao renderizar a seção {section}: {at.exception}")
+
+    benchmarks = {}
+    for section in section_queries:
+        benchmarks[f"render:{section}"] = lambda s=section: render(s, cold=False)
+        benchmarks[f"render_cold:{section}"] = lambda s=section: render(s, cold=True)
+    return benchmarks
+
+
+def run_benchmarks(selected: list[str], repeat: int) -> dict[str, dict]:
+    with duckdb.connect(str(gold_db_path), read_only=True) as con:
+        benchmarks = {}
+        if "queries" in selected:
+            benchmarks |= query_benchmarks(con)
+        if "charts" in selected:
+            benchmarks |= chart_benchmarks(con)
+        if "render" in selected:
+            benchmarks |= render_benchmarks()
+        return {name: measure(run, repeat) for name, run in benchmarks.items()}
+
+
+def find_regressions(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float,
+    min_delta_ms: float = 1.0,
+    min_delta_rss_kib: float = 1024,
+) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        delta_ms = result["p50_ms"] - base["p50_ms"]
+        if delta_ms > min_delta_ms and result["p50_ms"] > base["p50_ms"] * (
+            1 + tolerance
+        ):
+            regressions.append(
+                f"{name}: p50 {base['p50_ms']:.1f} -> {result['p50_ms']:.1f} ms"
+            )
+        if (
+            "rss_kib" in base
+            and result["rss_kib"]
+            > base["rss_kib"] * (1 + tolerance) + min_delta_rss_kib
+        ):
+            regressions.append(
+                f"{name}: RSS {base['rss_kib']:.0f} -> {result['rss_kib']:.0f} KiB"
+            )
+    return regressions
+
+
+def print_report(results: dict[str, dict]) -> None:
+    width = max(len(name) for name in results)
+    print(
+        f"{'benchmark':<{width}}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'RSS KiB':>9}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<{width}}  {r['p50_ms']:>8.2f}  {r['p95_ms']:>8.2f}  "
+            f"{r['p99_ms']:>8.2f}  {r['rss_kib']:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Mede consultas, construção de gráficos e renderização do dashboard."
+    )
+    parser.add_argument("--only", nargs="+", choices=groups, default=groups)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--baseline", type=Path, default=baseline_path)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="grava os resultados como nova linha de base",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="aumento relativo tolerado em relação à linha de base",
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.only, args.repeat)
+    print_report(results)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"Linha de base gravada em {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressões:\n" + "\n".join(regressions))
+            sys.exit(1)
+        print("Sem regressões em relação à linha de base.")
@@ -0,0 +1,404 @@
+from dataclasses import dataclass
+from functools import reduce
+
+import duckdb
+import numpy as np
+import polars as pl
+
+from queries import ad_categories
+from query_cache import instance_lru_cache
+
+ads_sql = """
+    select
+        Identificador_id,
+        Identificador,
+        anuncios.Identificador is not null as analisado,
+        "Original (primeira aparição)" is null as produto
+    from
+        dim_anuncios
+    left join
+        anuncios using(Identificador)
+    order by
+        Identificador_id
+"""
+editions_sql = """
+    select edicao_id, Ano, ano_edicao from dim_edicoes order by edicao_id
+"""
+insertions_sql = """
+    select
+        edicao_id,
+        Identificador_id,
+        Ano,
+        Página
+    from
+        fato_veiculacoes
+    order by
+        veiculacao_id
+"""
+values_sql = """
+    select value_id, propriedade, valor from dim_valores order by value_id
+"""
+index_sql = """
+    select value_id, Identificador_id from indice_propriedades
+"""
+
+value_indicators = {
+    "tipos_de_produto": "tipo_de_produto",
+    "molestias": "doenca_mencionada",
+    "substancias": "substancias",
+    "farmaceuticos": "responsavel_tecnico",
+}
+
+
+def to_bitset(mask: np.ndarray) -> np.ndarray:
+    """Packs a boolean mask into 64-bit words, bit i of the set standing for position i."""
+    packed = np.packbits(mask, bitorder="little")
+    return np.pad(packed, (0, -len(packed) % 8)).view(np.uint64)
+
+
+def from_bitset(bits: np.ndarray, n: int) -> np.ndarray:
+    return np.unpackbits(bits.view(np.uint8), count=n, bitorder="little").view(bool)
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+
+
+def union(bitsets) -> np.ndarray:
+    return reduce(np.bitwise_or, bitsets)
+
+
+@dataclass(frozen=True)
+class CrossFilter:
+    """A combination of filters: values are alternatives within a field, fields are combined."""
+
+    years: tuple[int, ...] = ()
+    editions: tuple[str, str] | None = None
+    pages: tuple[int, ...] = ()
+    values: tuple[tuple[str, tuple[str, ...]], ...] = ()
+
+    @property
+    def filters_insertions(self) -> bool:
+        return bool(self.years or self.editions or self.pages)
+
+    @property
+    def active(self) -> bool:
+        return self.filters_insertions or bool(self.values)
+
+
+class BitmapIndex:
+    """Bitsets of ad ids per property value and of veiculações per year and page.
+
+    A filter combination is resolved with a few ANDs and ORs over them, and the counts
+    shown by the dashboard are popcounts of the result, so no query runs per widget change.
+    """
+
+    def __init__(
+        self,
+        ads: pl.DataFrame,
+        editions: pl.DataFrame,
+        insertions: pl.DataFrame,
+        values: pl.DataFrame,
+        index: pl.DataFrame,
+        categories: dict[str, pl.DataFrame],
+    ):
+        # Ids are 1-based row numbers, so position 0 of every ad array stays unused.
+        self.n_ads = ads.height + 1
+        self.identifiers = np.array([None, *ads["Identificador"]], dtype=object)
+        self.analysed = np.concatenate([[False], ads["analisado"].to_numpy()])
+        self.products = np.concatenate([[False], ads["produto"].to_numpy()])
+
+        self.editions = editions
+        self.edition_labels = editions["ano_edicao"].to_numpy()
+        self.row_edition = insertions["edicao_id"].to_numpy()
+        self.row_ad = insertions["Identificador_id"].to_numpy()
+        self.row_year = insertions["Ano"].to_numpy()
+        self.row_page = insertions["Página"].to_numpy()
+        self.n_rows = insertions.height
+        self.all_rows = to_bitset(np.ones(self.n_rows, dtype=bool))
+        self.year_bits = {
+            int(year): to_bitset(self.row_year == year)
+            for year in np.unique(self.row_year)
+        }
+        self.page_bits = {
+            int(page): to_bitset(self.row_page == page)
+            for page in np.unique(self.row_page)
+        }
+
+        self.values = values
+        self.value_ids = {
+            (prop, value): value_id for value_id, prop, value in values.iter_rows()
+        }
+        self.index_value = index["value_id"].to_numpy()
+        self.index_ad = index["Identificador_id"].to_numpy()
+        self.value_bits = np.zeros(
+            (values.height + 1, len(to_bitset(np.zeros(self.n_ads, dtype=bool)))),
+            dtype=np.uint64,
+        )
+        np.bitwise_or.at(
+            self.value_bits,
+            (self.index_value, self.index_ad // 64),
+            np.left_shift(np.uint64(1), (self.index_ad % 64).astype(np.uint64)),
+        )
+        self.categories = categories
+
+    @classmethod
+    def from_connection(cls, con: duckdb.DuckDBPyConnection) -> "BitmapIndex":
+        return cls(
+            *(
+                con.sql(sql).pl()
+                for sql in [
+                    ads_sql,
+                    editions_sql,
+                    insertions_sql,
+                    values_sql,
+                    index_sql,
+                ]
+            ),
+            {name: con.sql(sql).pl() for name, sql in ad_categories.items()},
+        )
+
+    def edition_range(self, first: str, last: str) -> np.ndarray:
+        """Veiculações are stored by edition, so a range of editions is a range of bits."""
+        start, stop = np.searchsorted(self.edition_labels, [first, last], side="left")
+        start_id, stop_id = self.editions["edicao_id"].gather([start, stop]).to_list()
+        lo, hi = np.searchsorted(self.row_edition, [start_id, stop_id + 1])
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[lo:hi] = True
+        return to_bitset(mask)
+
+    @instance_lru_cache(maxsize=64)
+    def masks(self, f: CrossFilter) -> tuple[np.ndarray, np.ndarray]:
+        """Boolean masks of the ads and veiculações that pass every filter."""
+        rows = self.all_rows.copy()
+        if f.years:
+            rows &= union(self.year_bits.get(y, 0) for y in f.years)
+        if f.pages:
+            rows &= union(self.page_bits.get(p, 0) for p in f.pages)
+        if f.editions:
+            rows &= self.edition_range(*f.editions)
+
+        ads = to_bitset(np.ones(self.n_ads, dtype=bool))
+        for prop, values in f.values:
+            ids = [
+                self.value_ids[prop, v] for v in values if (prop, v) in self.value_ids
+            ]
+            ads &= np.bitwise_or.reduce(self.value_bits[ids], axis=0) if ids else 0
+
+        row_mask = (
+            from_bitset(rows, self.n_rows) & from_bitset(ads, self.n_ads)[self.row_ad]
+        )
+        if f.filters_insertions:
+            ads &= to_bitset(
+                np.bincount(self.row_ad[row_mask], minlength=self.n_ads) > 0
+            )
+        return from_bitset(ads, self.n_ads), row_mask
+
+    @instance_lru_cache(maxsize=64)
+    def value_counts(self, f: CrossFilter) -> np.ndarray:
+        """Number of filtered ads with each value: one AND and popcount per value."""
+        return popcount(self.value_bits & to_bitset(self.masks(f)[0]))
+
+    @instance_lru_cache(maxsize=64)
+    def pair_counts(self, f: CrossFilter) -> np.ndarray:
+        """Distinct editions each ad was placed in among the filtered veiculações."""
+        row_mask = self.masks(f)[1]
+        pairs = np.unique(
+            (self.row_edition[row_mask].astype(np.int64) << 32) | self.row_ad[row_mask]
+        )
+        return np.bincount(pairs & 0xFFFFFFFF, minlength=self.n_ads)
+
+    def filtered_rows(self, row_mask: np.ndarray) -> pl.DataFrame:
+        return pl.DataFrame(
+            {
+                "edicao_id": self.row_edition[row_mask],
+                "Ano": self.row_year[row_mask],
+                "Página": self.row_page[row_mask],
+            }
+        )
+
+    def properties(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        veiculacoes = np.bincount(
+            self.index_value,
+            weights=self.pair_counts(f)[self.index_ad],
+            minlength=self.values.height + 1,
+        )
+        return (
+            self.values.with_columns(
+                pl.Series("Anúncios", self.value_counts(f)[1:]),
+                pl.Series("Veiculações", veiculacoes[1:].astype(np.int64)),
+            )
+            .filter(pl.col("Anúncios") > 0)
+            .with_columns(
+                (pl.col("Anúncios") * pl.col("Veiculações")).alias("Prevalência")
+            )
+            .select(df.columns)
+            .cast(dict(df.schema))
+            .sort("propriedade", "valor")
+        )
+
+    def indicators(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        ad_mask, row_mask = self.masks(f)
+        values_left = self.values.filter(pl.Series(self.value_counts(f)[1:] > 0))
+        counts = {
+            "edicoes": len(np.unique(self.row_edition[row_mask])),
+            "veiculacoes": int(row_mask.sum()),
+            "anuncios_veiculados": len(np.unique(self.row_ad[row_mask])),
+            "anuncios_analisados": int((ad_mask & self.analysed).sum()),
+            "produtos": int((ad_mask & self.analysed & self.products).sum()),
+            **{
+                name: int((values_left["propriedade"] == prop).sum())
+                for name, prop in value_indicators.items()
+            },
+        }
+        return df.with_columns(
+            pl.lit(value, dtype=df.schema[name]).alias(name)
+            for name, value in counts.items()
+        )
+
+    def ads(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        counts = self.pair_counts(f)
+        placed = np.flatnonzero(counts)
+        return (
+            df.drop("Veiculações")
+            .join(
+                pl.DataFrame(
+                    {
+                        "Identificador": self.identifiers[placed].tolist(),
+                        "Veiculações": counts[placed],
+                    },
+                    schema={
+                        "Identificador": pl.Utf8,
+                        "Veiculações": df.schema["Veiculações"],
+                    },
+                ),
+                on="Identificador",
+            )
+            .select(df.columns)
+            .sort("Veiculações", descending=True)
+        )
+
+    def ads_by_edition(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        return (
+            self.filtered_rows(self.masks(f)[1])
+            .group_by("edicao_id")
+            .agg(
+                pl.len().alias("anuncios"),
+                pl.col("Página").min().alias("pagina_primeiro_anuncio"),
+                pl.col("Página").max().alias("pagina_ultimo_anuncio"),
+            )
+            .join(self.editions.rename({"Ano": "ano"}), on="edicao_id")
+            .select(df.columns)
+            .cast(dict(df.schema))
+            .sort("ano_edicao")
+        )
+
+    def placements_per_page(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        return (
+            self.filtered_rows(self.masks(f)[1])
+            .group_by("Ano", "Página")
+            .agg(pl.len().alias("Veiculações"))
+            .select(df.columns)
+            .cast(dict(df.schema))
+            .sort("Ano", "Página")
+        )
+
+    def pages_per_edition(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        return (
+            self.filtered_rows(self.masks(f)[1])
+            .group_by("edicao_id")
+            .agg(pl.col("Página").max().alias("Total de Páginas"))
+            .group_by("Total de Páginas")
+            .agg(pl.len().alias("Edições"))
+            .select(df.columns)
+            .cast(dict(df.schema))
+        )
+
+    def ailments_count_per_ad(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        ad_mask = self.masks(f)[0]
+        return df.filter(pl.Series(ad_mask[df["anuncio"].to_numpy()]))
+
+    def ailments_per_ad(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        row_mask = self.masks(f)[1]
+        ailments = self.values.with_columns(
+            pl.Series("Anúncios", self.value_counts(f)[1:])
+        ).filter(pl.col("propriedade") == "doenca_mencionada", pl.col("Anúncios") > 0)
+        in_ailments = np.isin(self.index_value, ailments["value_id"].to_numpy())
+        editions = (
+            pl.DataFrame(
+                {
+                    "edicao_id": self.row_edition[row_mask],
+                    "Identificador_id": self.row_ad[row_mask],
+                }
+            )
+            .join(
+                pl.DataFrame(
+                    {
+                        "value_id": self.index_value[in_ailments],
+                        "Identificador_id": self.index_ad[in_ailments],
+                    }
+                ),
+                on="Identificador_id",
+            )
+            .group_by("value_id")
+            .agg(pl.col("edicao_id").n_unique().alias("Veiculações"))
+        )
+        return (
+            ailments.join(editions, on="value_id", how="left")
+            .with_columns(pl.col("Veiculações").fill_null(0))
+            .with_columns(
+                pl.col("valor").alias("Moléstia"),
+                (pl.col("Anúncios") * pl.col("Veiculações")).alias("Prevalência"),
+            )
+            .select(df.columns)
+            .cast(dict(df.schema))
+            .sort("Anúncios", descending=True)
+        )
+
+    def ads_by_category(
+        self, name: str, df: pl.DataFrame, f: CrossFilter
+    ) -> pl.DataFrame:
+        """Distinct filtered ads in each category of the ad_categories query name."""
+        ad_mask = self.masks(f)[0]
+        categories = self.categories[name]
+        groups = [col for col in df.columns if col != "Anúncios"]
+        return (
+            categories.filter(
+                pl.Series(ad_mask[categories["Identificador_id"].to_numpy()])
+            )
+            .group_by(groups)
+            .agg(pl.col("Identificador_id").n_unique().alias("Anúncios"))
+            .select(df.columns)
+            .cast(dict(df.schema))
+            .sort(groups, nulls_last=True)
+        )
+
+    def authorizations(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        return self.ads_by_category("authorizations", df, f)
+
+    def typographic_variations(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        return self.ads_by_category("typographic_variations", df, f)
+
+    def image_presence(self, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        return self.ads_by_category("image_presence", df, f)
+
+    def apply(self, name: str, df: pl.DataFrame, f: CrossFilter) -> pl.DataFrame:
+        """The result of a dashboard query under a filter, or df itself if it is not indexed."""
+        if not f.active or name not in filterable_queries:
+            return df
+        return getattr(self, name)(df, f)
+
+
+filterable_queries = {
+    "properties",
+    "indicators",
+    "ads",
+    "ads_by_edition",
+    "placements_per_page",
+    "pages_per_edition",
+    "ailments_count_per_ad",
+    "ailments_per_ad",
+    "authorizations",
+    "typographic_variations",
+    "image_presence",
+}
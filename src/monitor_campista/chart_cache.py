@@ -0,0 +1,148 @@
+import base64
+import copy
+import hashlib
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+import altair as alt
+import polars as pl
+import pyarrow as pa
+
+from query_cache import db_fingerprint
+
+# Altair's data transformer and theme registries are process-global, and Streamlit
+# renders sessions on concurrent threads.
+altair_lock = threading.Lock()
+
+
+def to_arrow_bytes(data: Any) -> bytes:
+    table = data.to_arrow() if isinstance(data, pl.DataFrame) else pa.table(data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_vega_lite_spec(chart: alt.TopLevelMixin) -> dict:
+    """Serializes a chart the way st.altair_chart does, keeping datasets as Arrow IPC bytes."""
+    datasets = {}
+
+    def arrow_transform(data: Any) -> dict[str, str]:
+        data_bytes = to_arrow_bytes(data)
+        name = hashlib.md5(data_bytes).hexdigest()
+        datasets[name] = data_bytes
+        return {"name": name}
+
+    with altair_lock:
+        alt.data_transformers.register("arrow_ipc", arrow_transform)
+        with alt.theme.enable("none"), alt.data_transformers.enable("arrow_ipc"):
+            spec = chart.to_dict()
+    spec["datasets"] = datasets
+    return spec
+
+
+def spec_size(spec: dict) -> tuple[int, int]:
+    """Rows and Arrow IPC bytes of the datasets embedded in a spec."""
+    rows = sum(
+        pa.ipc.open_stream(data).read_all().num_rows
+        for data in spec["datasets"].values()
+    )
+    return rows, sum(len(data) for data in spec["datasets"].values())
+
+
+def dump_spec(spec: dict) -> str:
+    datasets = {
+        name: base64.b64encode(data).decode() for name, data in spec["datasets"].items()
+    }
+    return json.dumps({**spec, "datasets": datasets})
+
+
+def load_spec(text: str) -> dict:
+    spec = json.loads(text)
+    spec["datasets"] = {
+        name: base64.b64decode(data) for name, data in spec["datasets"].items()
+    }
+    return spec
+
+
+class ChartSpecCache:
+    """Final Vega-Lite specs keyed by chart id, code version and database fingerprint.
+
+    Specs live in a bounded in-memory LRU and, when spec_dir is given, in one JSON
+    file per chart under a directory named after the current generation.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        version: str,
+        spec_dir: Path | None = None,
+        maxsize: int = 512,
+    ):
+        self.db_path = Path(db_path)
+        self.version = version
+        self.spec_dir = Path(spec_dir) if spec_dir else None
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._generation: str | None = None
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _spec_path(self, generation: str, chart_id: str) -> Path:
+        key = hashlib.sha256(chart_id.encode()).hexdigest()
+        return self.spec_dir / generation / f"{key}.json"
+
+    def _start_generation(self, generation: str) -> None:
+        self._entries.clear()
+        self._generation = generation
+        if self.spec_dir and self.spec_dir.is_dir():
+            for stale in self.spec_dir.iterdir():
+                if stale.is_dir() and stale.name != generation:
+                    shutil.rmtree(stale, ignore_errors=True)
+
+    def get(self, chart_id: str, build: Callable[[], alt.TopLevelMixin]) -> dict:
+        """Returns a copy of the cached spec, building and storing it on a miss."""
+        return self.lookup(chart_id, build)[0]
+
+    def lookup(
+        self, chart_id: str, build: Callable[[], alt.TopLevelMixin]
+    ) -> tuple[dict, bool]:
+        """Like get, but also reports whether the spec came from memory."""
+        generation = hashlib.sha256(
+            repr((self.version, db_fingerprint(self.db_path))).encode()
+        ).hexdigest()[:16]
+        with self._lock:
+            if generation != self._generation:
+                self._start_generation(generation)
+            spec = self._entries.get(chart_id)
+            if spec is not None:
+                self._entries.move_to_end(chart_id)
+                self.hits += 1
+                return copy.deepcopy(spec), True
+
+        path = self._spec_path(generation, chart_id) if self.spec_dir else None
+        if path and path.exists():
+            spec = load_spec(path.read_text())
+        else:
+            spec = to_vega_lite_spec(build())
+            if path:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(dump_spec(spec))
+
+        with self._lock:
+            self.misses += 1
+            if generation == self._generation:
+                self._entries[chart_id] = spec
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return copy.deepcopy(spec), False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
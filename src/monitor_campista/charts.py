@@ -0,0 +1,292 @@
+import tomllib
+from pathlib import Path
+
+import altair as alt
+import polars as pl
+
+config_path = Path(__file__).parent / ".streamlit" / "config.toml"
+with open(config_path, "rb") as f:
+    color_scale = tomllib.load(f)["theme"]["colorScale"]
+
+discourse_analysis = [
+    ["discursos_de_autoridade", "Discursos de autoridade", "True", "True", 10],
+    ["publico_mencionado", "Público mencionado", True, True, None],
+    # ["origem", "Origem", True, False],
+]
+
+graphical_analysis = [
+    ["informacoes_indicativas", "Informações indicativas"],
+    ["detalhamento_do_efeito", "Detalhamento do efeito"],
+    ["detalhamento_forma_de_uso", "Detalhamento da forma de uso"],
+    ["variacao_typeface", "Variação de typeface"],
+    ["variacao_tipografica", "Variação tipográfica", True, True],
+    ["alinhamento", "Alinhamento"],
+    ["diagramacao", "Diagramação", True, True],
+    ["hieraquia_da_informacao", "Hierarquia da informação", True, True],
+    ["elementos_de_composicao", "Elementos de composição"],
+    ["sinal_visual_de_autoridade", "Sinal visual de autoridade"],
+]
+
+
+def property_frame(df_properties: pl.DataFrame, property: str) -> pl.DataFrame:
+    return df_properties.filter(pl.col("propriedade") == property).drop("propriedade")
+
+
+def anuncios_by_property(df_properties: pl.DataFrame, property: str) -> pl.DataFrame:
+    return (
+        property_frame(df_properties, property)
+        .select(pl.col("valor").alias(property), "Anúncios")
+        .sort("Anúncios", descending=True)
+    )
+
+
+def veiculacoes_by_property(df_properties: pl.DataFrame, property: str) -> pl.DataFrame:
+    return (
+        property_frame(df_properties, property)
+        .filter(pl.col("Veiculações") > 0)
+        .select(pl.col("valor").alias(property), "Veiculações")
+        .sort("Veiculações", descending=True)
+    )
+
+
+def property_table(
+    df_properties: pl.DataFrame, property: str, property_title: str | None = None
+) -> pl.DataFrame:
+    return (
+        property_frame(df_properties, property)
+        .rename({"valor": property_title if property_title else property})
+        .sort("Prevalência", descending=True)
+        .with_columns(
+            (pl.col("Prevalência") * 100 / pl.col("Prevalência").max()).alias(
+                "Prevalência"
+            )
+        )
+    )
+
+
+def property_histogram(
+    df_by_property: pl.DataFrame,
+    property: str,
+    count_col: str,
+    total: int,
+    title: str | None = None,
+    show_percentage: bool | None = True,
+    invert_axis: bool | None = None,
+    top_k=None,
+):
+    if show_percentage is None:
+        show_percentage = True
+
+    x = alt.X(property, title="", sort="-x" if invert_axis else "-y")
+    y = alt.Y(count_col, title=count_col)
+
+    dx, dy = 0, -10
+
+    if invert_axis:
+        x, y = y, x
+        dx, dy = 15, dx
+
+    df_property = df_by_property.with_columns(
+        (pl.col(count_col) / total * 100).alias("percent_full")
+    )
+    if top_k:
+        df_property = df_property.top_k(k=top_k, by=count_col)
+
+    df_property = df_property.with_columns(
+        (pl.col("percent_full").round(2).cast(pl.Utf8) + "%").alias("percent_full_str"),
+        (pl.col("percent_full").round(0).cast(pl.Int32).cast(pl.Utf8) + "%").alias(
+            "percent_str"
+        ),
+    )
+
+    base = alt.Chart(df_property)
+    chart = (
+        base.mark_bar()
+        .encode(
+            x=x,
+            y=y,
+            color=alt.Color(value=color_scale[1]),
+            tooltip=[
+                alt.Tooltip(property, title=property),
+                alt.Tooltip(count_col, title=count_col),
+                alt.Tooltip("percent_full_str", title="Percentual"),
+            ],
+        )
+        .properties(title=title if title else property)
+    )
+
+    text = base.mark_text(dx=dx, dy=dy, color="black", fontSize=12).encode(
+        x=x, y=y, text=alt.Text("percent_str")
+    )
+    return chart + text if show_percentage else chart
+
+
+def df_to_histogram(df, x_col, y_col, color_col=None, title=None):
+    df = df.with_columns((pl.col(y_col) / pl.col(y_col).sum()).alias("percent"))
+    base = alt.Chart(df)
+
+    if color_col:
+        color = alt.Color(shorthand=color_col).scale(range=color_scale)
+    else:
+        color = alt.Color(value=color_scale[0])
+
+    bars = (
+        base.mark_bar().encode(
+            x=alt.X(shorthand=f"{x_col}:N", axis=alt.Axis(labelAngle=0)),
+            y=alt.Y(shorthand=f"{y_col}"),
+            color=color,
+        )
+    ).properties(title=title if title else f"{y_col} por {x_col.lower()}")
+
+    text = base.mark_text(dy=-8).encode(
+        x=f"{x_col}:N",
+        y=f"{y_col}:Q",
+        text=alt.Text(shorthand="percent:Q", format=".0%"),
+    )
+
+    return bars + text
+
+
+def df_to_histogram_count_by_x(df, x_col, x_title, y_title):
+    df = (
+        df.group_by(x_col)
+        .agg(pl.len().alias("count"))
+        .with_columns(
+            (
+                (pl.col("count") / pl.col("count").sum() * 100)
+                .round(0)
+                .cast(pl.Int64)
+                .cast(pl.Utf8)
+                + "%"
+            ).alias("percent")
+        )
+        .sort(x_col)
+    )
+    base = alt.Chart(df).properties(title=f"{y_title} por {x_title.lower()}")
+
+    bars = base.mark_bar().encode(
+        x=alt.X(f"{x_col}:N", title=x_title, sort="x", axis=alt.Axis(labelAngle=0)),
+        y=alt.Y("count:Q", title=y_title),
+        color=alt.Color(value=color_scale[0]),
+    )
+
+    text = base.mark_text(dy=-6, fontSize=11).encode(
+        x=alt.X(f"{x_col}:N", sort="x"), y="count:Q", text="percent:N"
+    )
+
+    return bars + text
+
+
+def ads_per_edition_chart(df_ads_by_edition):
+    return (
+        alt.Chart(df_ads_by_edition)
+        .mark_circle(size=120)
+        .encode(
+            x=alt.X("ano_edicao").title("Edição"),
+            y=alt.Y("anuncios").title("Contagem Anúncios"),
+            color=alt.Color("ano:N").scale(range=color_scale),
+        )
+        .properties(title="Veiculação por Edição")
+    )
+
+
+def placements_per_page_chart(df_placements_per_page):
+    base = alt.Chart(df_placements_per_page)
+    bars = base.mark_bar().encode(
+        x=alt.X("Página:N").axis(labelAngle=0),
+        y=alt.Y("Veiculações:Q", title="Veiculações"),
+        color=alt.Color("Ano:N").scale(range=color_scale),
+    )
+    text = base.mark_text(
+        align="center",
+        baseline="middle",
+        dy=-10,  # adjust vertical position of the text
+    ).encode(
+        x=alt.X("Página:N"),
+        y=alt.Y("sum(Veiculações):Q"),
+        text=alt.Text("sum(Veiculações):Q"),
+    )
+    return (bars + text).properties(title="Veiculações por página")
+
+
+def ailments_per_ad_chart(df_ailments_per_ad):
+    return (
+        alt.Chart(df_ailments_per_ad)
+        .mark_circle(size=200)
+        .encode(
+            x=alt.X("Anúncios"),
+            y=alt.Y("Veiculações"),
+            text="Moléstia",
+            tooltip=["Moléstia", "Anúncios", "Veiculações"],
+            color=alt.Color(
+                "Moléstia", scale=alt.Scale(range=color_scale), legend=None
+            ),
+        )
+    ).properties(title="Moléstias por veiculações e anúncios")
+
+
+def top_ailments_chart(df_ailments_per_ad):
+    df_top_ailments = df_ailments_per_ad.top_k(100, by="Prevalência")
+    base = alt.Chart(df_top_ailments).encode(
+        x=alt.X("Moléstia:N", sort=alt.SortField(field="Anúncios", order="descending"))
+    )
+    bar1 = base.mark_bar(color=color_scale[1]).encode(
+        y=alt.Y("Anúncios:Q").axis(titleColor=color_scale[1], orient="left"),
+        tooltip=["Moléstia", "Anúncios", "Veiculações"],
+    )
+    bar2 = base.mark_bar(color=color_scale[3]).encode(
+        y=alt.Y("Veiculações:Q").axis(titleColor=color_scale[3], orient="right"),
+        tooltip=["Moléstia", "Anúncios", "Veiculações"],
+    )
+    return (
+        alt.layer(bar2, bar1).resolve_scale(y="independent").configure_mark(opacity=0.6)
+    ).properties(title="Moéstias por veiculações e anúncios")
+
+
+def authorizations_chart(df_authorizations):
+    x_col = "Autorização"
+    y_col = "Anúncios"
+    color_col = "Autoridade"
+    return (
+        alt.Chart(df_authorizations)
+        .mark_bar()
+        .encode(
+            x=alt.X(f"{x_col}:N", axis=alt.Axis(labelAngle=0)),
+            y=alt.X(f"{y_col}"),
+            color=alt.Color(color_col, scale=alt.Scale(range=color_scale[1:])),
+        )
+        .properties(title="Menção à autorização")
+    )
+
+
+def cooccurrence_heatmap(df_cooccurrence, a_title, b_title, metric, top_k=20):
+    def top_values(col):
+        return (
+            df_cooccurrence.group_by(col)
+            .agg(pl.col("Anúncios").sum())
+            .sort(["Anúncios", col], descending=[True, False])
+            .head(top_k)[col]
+            .to_list()
+        )
+
+    top_a, top_b = top_values("a"), top_values("b")
+    df = df_cooccurrence.filter(pl.col("a").is_in(top_a) & pl.col("b").is_in(top_b))
+    return (
+        alt.Chart(df)
+        .mark_rect()
+        .encode(
+            x=alt.X("b:N", sort=top_b).title(b_title).axis(labelAngle=-45),
+            y=alt.Y("a:N", sort=top_a).title(a_title),
+            color=alt.Color(f"{metric}:Q").scale(
+                range=[color_scale[0], color_scale[3]]
+            ),
+            tooltip=[
+                alt.Tooltip("a:N", title=a_title),
+                alt.Tooltip("b:N", title=b_title),
+                "Anúncios",
+                alt.Tooltip("Lift:Q", format=".2f"),
+                alt.Tooltip("Jaccard:Q", format=".2f"),
+            ],
+        )
+        .properties(title=f"Coocorrência: {a_title} × {b_title}")
+    )
@@ -0,0 +1,112 @@
+import queue
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import duckdb
+
+
+class ConnectionPool:
+    """Bounded pool of read-only cursors over one shared DuckDB database instance."""
+
+    def __init__(self, db_path: Path, size: int = 4, timeout: float = 30.0):
+        self.db_path = Path(db_path)
+        self.size = size
+        self.timeout = timeout
+        self._database: duckdb.DuckDBPyConnection | None = None
+        self._idle: queue.LifoQueue[duckdb.DuckDBPyConnection] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._lent = 0
+        self._retired = False
+        self._closed = False
+
+    def _get_database(self) -> duckdb.DuckDBPyConnection:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ConnectionPool is closed")
+            if self._database is None:
+                self._database = duckdb.connect(str(self.db_path), read_only=True)
+            return self._database
+
+    def _checkout(self) -> duckdb.DuckDBPyConnection:
+        while True:
+            try:
+                cursor = self._idle.get_nowait()
+            except queue.Empty:
+                return self._get_database().cursor()
+            if is_healthy(cursor):
+                return cursor
+            cursor.close()
+
+    def _checkin(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        with self._lock:
+            if self._closed:
+                cursor.close()
+                return
+        self._idle.put(cursor)
+
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Lends a cursor to the calling thread, blocking while all are in use."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(
+                f"no DuckDB cursor available after {self.timeout}s (pool size {self.size})"
+            )
+        with self._lock:
+            self._lent += 1
+        try:
+            cursor = self._checkout()
+            try:
+                yield cursor
+            finally:
+                self._checkin(cursor)
+        finally:
+            with self._lock:
+                self._lent -= 1
+                if self._retired and not self._lent:
+                    self._close_database()
+            self._slots.release()
+
+    def retire(self) -> None:
+        """Closes the database as soon as no cursor is lent.
+
+        Unlike close, the pool stays usable: a rerun still holding it reopens the
+        database for its query, which is closed again once that cursor is returned."""
+        with self._lock:
+            self._retired = True
+            if not self._lent:
+                self._close_database()
+
+    def _close_database(self) -> None:
+        """Closes the idle cursors and the database; called with the lock held."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+
+    def close(self) -> None:
+        """Closes the database once the lent cursors are returned, or after the timeout.
+
+        Closing the database invalidates its cursors, so queries in flight finish first."""
+        drained = 0
+        while drained < self.size and self._slots.acquire(timeout=self.timeout):
+            drained += 1
+        with self._lock:
+            self._closed = True
+            self._close_database()
+        for _ in range(drained):
+            self._slots.release()
+
+
+def is_healthy(cursor: duckdb.DuckDBPyConnection) -> bool:
+    try:
+        cursor.execute("select 1").fetchone()
+    except duckdb.Error:
+        return False
+    return True
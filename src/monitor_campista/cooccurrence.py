@@ -0,0 +1,82 @@
+import numpy as np
+import polars as pl
+
+from bitmap_index import BitmapIndex, CrossFilter
+from query_cache import instance_lru_cache
+
+metrics = ["Anúncios", "Lift", "Jaccard"]
+
+
+def incidence_product(
+    a_rows: np.ndarray,
+    a_cols: np.ndarray,
+    b_rows: np.ndarray,
+    b_cols: np.ndarray,
+    n_b_cols: int,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Nonzero (i, j, count) entries of Aᵀ·B for 0/1 matrices given by their (row, col)
+    entries, B sorted by row.
+
+    Every entry of A is paired with the entries of B in the same row, which is the work
+    a sparse product does, and equal pairs are summed with a single np.unique."""
+    n_rows = max(a_rows.max(initial=-1), b_rows.max(initial=-1)) + 1
+    b_counts = np.bincount(b_rows, minlength=n_rows)
+    b_starts = np.cumsum(b_counts) - b_counts
+    repeats = b_counts[a_rows]
+    pair_starts = np.cumsum(repeats) - repeats
+    left = np.repeat(a_cols, repeats)
+    right = b_cols[
+        np.repeat(b_starts[a_rows] - pair_starts, repeats) + np.arange(repeats.sum())
+    ]
+    keys, counts = np.unique(
+        left.astype(np.int64) * n_b_cols + right, return_counts=True
+    )
+    return keys // n_b_cols, keys % n_b_cols, counts
+
+
+class CooccurrenceIndex:
+    """Sparse ad × value incidence of each property, taken from the bitmap index.
+
+    The co-occurrence of two properties is the product of their incidence matrices,
+    restricted to the ads passing the sidebar filters."""
+
+    def __init__(self, bitmap: BitmapIndex):
+        self.bitmap = bitmap
+        order = np.lexsort((bitmap.index_value, bitmap.index_ad))
+        ads = bitmap.index_ad[order]
+        values = bitmap.index_value[order]
+
+        # Value ids are numbered by (propriedade, valor), so each property is a range.
+        self.labels = {}
+        self.entries = {}
+        for (prop,), group in bitmap.values.group_by(
+            "propriedade", maintain_order=True
+        ):
+            first, last = group["value_id"].min(), group["value_id"].max()
+            in_property = (values >= first) & (values <= last)
+            self.labels[prop] = group.sort("value_id")["valor"].to_numpy()
+            self.entries[prop] = (ads[in_property], values[in_property] - first)
+
+    @instance_lru_cache(maxsize=64)
+    def matrix(self, a: str, b: str, f: CrossFilter) -> pl.DataFrame:
+        """Ads sharing each pair of values of properties a and b, with lift and Jaccard."""
+        ads = self.bitmap.masks(f)[0] & self.bitmap.analysed
+        (a_rows, a_cols), (b_rows, b_cols) = self.entries[a], self.entries[b]
+        a_keep, b_keep = ads[a_rows], ads[b_rows]
+        a_rows, a_cols = a_rows[a_keep], a_cols[a_keep]
+        b_rows, b_cols = b_rows[b_keep], b_cols[b_keep]
+        n_a, n_b = len(self.labels[a]), len(self.labels[b])
+
+        i, j, both = incidence_product(a_rows, a_cols, b_rows, b_cols, n_b)
+        a_ads = np.bincount(a_cols, minlength=n_a)
+        b_ads = np.bincount(b_cols, minlength=n_b)
+        return pl.DataFrame(
+            {
+                "a": self.labels[a][i],
+                "b": self.labels[b][j],
+                "Anúncios": both,
+                "Lift": ads.sum() * both / (a_ads[i] * b_ads[j]),
+                "Jaccard": both / (a_ads[i] + b_ads[j] - both),
+            },
+            schema_overrides={"a": pl.Utf8, "b": pl.Utf8},
+        )
@@ -1,179 +1,288 @@
 import streamlit as st
-import altair as alt
 import polars as pl
-import tomllib
-import duckdb
+import atexit
+import hashlib
+import os
+import time
+from functools import partial
 from pathlib import Path
 
-with open(Path("src/monitor_campista/.streamlit/config.toml"), "rb") as f:
-    config = tomllib.load(f)
+from bitmap_index import BitmapIndex, CrossFilter, filterable_queries
+from chart_cache import ChartSpecCache, spec_size
+from charts import (
+    ads_per_edition_chart,
+    ailments_per_ad_chart,
+    anuncios_by_property,
+    authorizations_chart,
+    config_path,
+    cooccurrence_heatmap,
+    df_to_histogram,
+    df_to_histogram_count_by_x,
+    discourse_analysis,
+    graphical_analysis,
+    placements_per_page_chart,
+    property_frame,
+    property_histogram,
+    property_table,
+    top_ailments_chart,
+    veiculacoes_by_property,
+)
+from connection import ConnectionPool
+from cooccurrence import CooccurrenceIndex, metrics
+from data_processing import clean_text, multi_select_columns
+from instrumentation import Event, Recorder, configure_json_logs, merge_totals
+from queries import queries, section_queries
+from query_cache import QueryCache, db_fingerprint
+from scheduler import QueryScheduler
+from search_index import SearchIndex
+from snapshot import Snapshot
 
 page_title = "Anúncios de Fármacos Monitor Campista (1880-1884)"
 title = "Entre tônicos e depurativos: a memória gráfica nos anúncios de fármacos do Monitor Campista <small>(1880-1884)</small>"
 
 st.set_page_config(page_title=page_title, layout="centered", page_icon="📰")
 
+recorder = Recorder()
+if os.environ.get("MONITOR_CAMPISTA_JSON_LOGS"):
+    configure_json_logs()
+
 st.markdown(f"<h1 style='font-size: 28px;'>{title}</h1>", unsafe_allow_html=True)
 
-color_scale = config["theme"]["colorScale"]
-con = duckdb.connect("data/03_gold/monitor_campista_pharma_ads_1880_1884.duckdb", True)
+db_path = (
+    Path(os.environ.get("MONITOR_CAMPISTA_GOLD_DIR", "data/03_gold"))
+    / "monitor_campista_pharma_ads_1880_1884.duckdb"
+)
+snapshot_path = db_path.with_suffix(".arrow")
+spec_dir = os.environ.get("MONITOR_CAMPISTA_SPEC_DIR")
+query_names = {sql: name for name, sql in queries.items()}
+property_labels = {clean_text(col): col for col in multi_select_columns}
+cross_filter = CrossFilter()
 
 
-def get_df_anuncios_by_property(property):
-    return con.sql(f"""
-    select
-        {property},
-        count(distinct Identificador) as Anúncios
-    from
-        anuncios
-    left join
-        {property} using(Identificador)
-    where
-        {property} is not null
-    group by
-        {property}
-    order by
-        Anúncios desc
-    """).pl()
+@st.cache_resource
+def get_open_pools() -> list[ConnectionPool]:
+    pools: list[ConnectionPool] = []
+    atexit.register(close_pools, pools)
+    return pools
 
 
-def get_df_veiculacoes_by_property(property):
-    return con.sql(f"""
-    select
-        {property},
-        count(distinct ano_edicao ||Identificador) as Veiculações
-    from
-        veiculacoes
-    left join
-        {property} using(Identificador)
-    where
-        {property} is not null
-    group by
-        {property}
-    order by
-        Veiculações desc
-    """).pl()
-
-
-def df_to_histogram(df, x_col, y_col, color_col=None, title=None):
-    df = df.to_pandas()
-    df["percent"] = df[y_col] / df[y_col].sum()
-
-    if color_col:
-        color = alt.Color(shorthand=color_col).scale(range=color_scale)
-    else:
-        color = alt.Color(value=color_scale[0])
-
-    bars = (
-        alt.Chart(df)
-        .mark_bar()
-        .encode(
-            x=alt.X(shorthand=f"{x_col}:N", axis=alt.Axis(labelAngle=0)),
-            y=alt.Y(shorthand=f"{y_col}"),
-            color=color,
-        )
-    ).properties(title=title if title else f"{y_col} por {x_col.lower()}")
-
-    text = (
-        alt.Chart(data=df)
-        .mark_text(dy=-8)
-        .encode(
-            x=f"{x_col}:N",
-            y=f"{y_col}:Q",
-            text=alt.Text(shorthand="percent:Q", format=".0%"),
-        )
-    )
+def close_pools(pools: list[ConnectionPool]) -> None:
+    while pools:
+        pools.pop().close()
 
-    return bars + text
 
+@st.cache_resource(max_entries=1)
+def get_connection_pool(fingerprint: tuple[int, int]) -> ConnectionPool:
+    """One pool per version of the gold database.
 
-def df_to_histogram_count_by_x(df, x_col, x_title, y_title):
-    base = (
-        alt.Chart(df)
-        .transform_aggregate(count="count()", groupby=[x_col])
-        .transform_joinaggregate(total="sum(count)")
-        .transform_calculate(percent="round(datum.count / datum.total * 100, 1) + '%'")
-    ).properties(title=f"{y_title} por {x_title.lower()}")
+    The pool of the replaced version is retired rather than closed: reruns of other
+    sessions that still hold it finish their queries, and its read-only handle and file
+    lock are released once they return their cursors."""
+    pools = get_open_pools()
+    while pools:
+        pools.pop().retire()
+    pool = ConnectionPool(db_path, size=4)
+    pools.append(pool)
+    return pool
+
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    return QueryCache(db_path, maxsize=256)
+
+
+@st.cache_resource
+def get_query_scheduler() -> QueryScheduler:
+    scheduler = QueryScheduler(max_workers=4)
+    atexit.register(scheduler.close)
+    return scheduler
+
+
+@st.cache_resource
+def get_chart_cache() -> ChartSpecCache:
+    version = hashlib.sha256()
+    for path in [*sorted(Path(__file__).parent.glob("*.py")), config_path]:
+        version.update(path.read_bytes())
+    return ChartSpecCache(db_path, version.hexdigest(), spec_dir=spec_dir)
+
+
+@st.cache_resource(max_entries=1)
+def get_snapshot(
+    fingerprint: tuple[int, int], snapshot_mtime_ns: int | None
+) -> Snapshot:
+    """The snapshot of one version of the gold database.
+
+    The pipeline writes the snapshot after the database, so it is also keyed on the
+    snapshot file: one read in between is replaced once the new file lands."""
+    return Snapshot(snapshot_path, db_path, queries)
 
-    bars = base.mark_bar().encode(
-        x=alt.X(f"{x_col}:N", title=x_title, sort="x", axis=alt.Axis(labelAngle=0)),
-        y=alt.Y("count:Q", title=y_title),
-        color=alt.Color(value=color_scale[0]),
-    )
 
-    text = base.mark_text(dy=-6, fontSize=11).encode(
-        x=alt.X(f"{x_col}:N", sort="x"), y="count:Q", text="percent:N"
+def query_runner():
+    """run_query bound to the pool and snapshot of the current gold database."""
+    fingerprint = db_fingerprint(db_path)
+    snapshot_mtime_ns = (
+        snapshot_path.stat().st_mtime_ns if snapshot_path.exists() else None
+    )
+    return partial(
+        run_query,
+        get_connection_pool(fingerprint),
+        get_snapshot(fingerprint, snapshot_mtime_ns),
     )
 
-    return bars + text
 
+@st.cache_resource(max_entries=1)
+def get_bitmap_index(fingerprint: tuple[int, int]) -> BitmapIndex:
+    with get_connection_pool(fingerprint).cursor() as con:
+        return BitmapIndex.from_connection(con)
 
-def property_to_histogram_by_anuncios(
-    property: str,
-    title: str | None = None,
-    show_percentage: bool | None = True,
-    invert_axis: bool | None = None,
-    top_k=None,
-    is_sum=True,
-):
-    total_anuncios = con.sql(
-        """select count(distinct Identificador) from anuncios"""
-    ).pl()[0, 0]
 
-    if show_percentage is None:
-        show_percentage = True
+@st.cache_resource(max_entries=1)
+def get_cooccurrence_index(fingerprint: tuple[int, int]) -> CooccurrenceIndex:
+    return CooccurrenceIndex(get_bitmap_index(fingerprint))
 
-    x = alt.X(property, title="", sort="-x" if invert_axis else "-y")
-    y = alt.Y("Anúncios", title="Anúncios")
 
-    dx, dy = 0, -10
+@st.cache_resource(max_entries=1)
+def get_search_index(fingerprint: tuple[int, int]) -> SearchIndex:
+    with get_connection_pool(fingerprint).cursor() as con:
+        return SearchIndex.from_connection(con)
 
-    if invert_axis:
-        x, y = y, x
-        dx, dy = 15, dx
 
-    df_property = get_df_anuncios_by_property(property)
+def run_query(pool: ConnectionPool, snapshot: Snapshot, sql: str) -> pl.DataFrame:
+    df = snapshot.get(sql)
+    if df is not None:
+        return df
+    with pool.cursor() as con:
+        return con.sql(sql).pl()
 
-    # total_anuncios = df_property.select(pl.col("Anúncios").sum()).to_numpy()[0][0]
-    df_property = df_property.with_columns(
-        (pl.col("Anúncios") / total_anuncios * 100).alias("percent_full")
+
+def recorded_query(cache: QueryCache, run, sql: str) -> pl.DataFrame:
+    start = time.perf_counter()
+    df, hit = cache.lookup(sql, run)
+    recorder.record(
+        Event(
+            "query",
+            query_names.get(sql, sql),
+            (time.perf_counter() - start) * 1000,
+            "hit" if hit else "miss",
+            df.height,
+            df.estimated_size(),
+        )
     )
-    if top_k:
-        df_property = df_property.top_k(k=top_k, by="Anúncios")
+    return df
+
+
+def apply_cross_filter(name: str, df: pl.DataFrame) -> pl.DataFrame:
+    if not cross_filter.active or name not in filterable_queries:
+        return df
+    start = time.perf_counter()
+    index = get_bitmap_index(db_fingerprint(db_path))
+    df = index.apply(name, df, cross_filter)
+    recorder.record(
+        Event(
+            "filter",
+            name,
+            (time.perf_counter() - start) * 1000,
+            "-",
+            df.height,
+            df.estimated_size(),
+        )
+    )
+    return df
 
-    df_property = df_property.with_columns(
-        (pl.col("percent_full").round(2).cast(pl.Utf8) + "%").alias("percent_full_str"),
-        (pl.col("percent_full").round(0).cast(pl.Int32).cast(pl.Utf8) + "%").alias(
-            "percent_str"
-        ),
+
+def query(sql: str, cross_filtered: bool = True) -> pl.DataFrame:
+    run = query_runner()
+    df = recorded_query(get_query_cache(), run, sql)
+    return apply_cross_filter(query_names.get(sql, sql), df) if cross_filtered else df
+
+
+def query_many(names: list[str]) -> dict[str, pl.DataFrame]:
+    run = query_runner()
+    frames = get_query_scheduler().run(
+        {name: queries[name] for name in names},
+        partial(recorded_query, get_query_cache(), run),
     )
+    return {name: apply_cross_filter(name, df) for name, df in frames.items()}
+
 
-    chart = (
-        alt.Chart(df_property.to_pandas())
-        .mark_bar()
-        .encode(
-            x=x,
-            y=y,
-            color=alt.Color(value=color_scale[1]),
-            tooltip=[
-                alt.Tooltip(property, title=property),
-                alt.Tooltip("Anúncios", title="Anúncios"),
-                alt.Tooltip("percent_full_str", title="Percentual"),
-            ],
+def search_ads(text: str, df_ads: pl.DataFrame) -> pl.DataFrame:
+    """Ads matching the search, ranked, among the ones passing the sidebar filters."""
+    start = time.perf_counter()
+    results = get_search_index(db_fingerprint(db_path)).search(text)
+    df = results.join(df_ads, on="Identificador", maintain_order="left").select(
+        df_ads.columns
+    )
+    recorder.record(
+        Event(
+            "search",
+            text,
+            (time.perf_counter() - start) * 1000,
+            "-",
+            df.height,
+            df.estimated_size(),
         )
-        .properties(title=title if title else property)
     )
-
-    text = (
-        alt.Chart(df_property)
-        .mark_text(dx=dx, dy=dy, color="black", fontSize=12)
-        .encode(x=x, y=y, text=alt.Text("percent_str"))
+    return df
+
+
+def group_variants(df_ads: pl.DataFrame, df_groups: pl.DataFrame) -> pl.DataFrame:
+    """One row per group of variants, shown with its most placed ad."""
+    return (
+        df_ads.join(df_groups, on="Identificador", how="left")
+        .with_columns(pl.col("Grupo").fill_null(pl.col("Identificador")))
+        .group_by("Grupo", maintain_order=True)
+        .agg(
+            pl.col("Anúncio").first(),
+            pl.col("Produto ofertado (título completo)").first(),
+            pl.len().alias("Variantes"),
+            pl.col("Veiculações").sum(),
+            pl.col("Identificador").str.join(", ").alias("Identificadores"),
+        )
+        .sort("Veiculações", descending=True, maintain_order=True)
+        .drop("Grupo")
+    )
+
+
+def cached_chart(chart_id: str, build, use_container_width: bool | None = None):
+    start = time.perf_counter()
+    key = f"{chart_id} {cross_filter!r}" if cross_filter.active else chart_id
+    spec, hit = get_chart_cache().lookup(key, build)
+    rows, arrow_bytes = spec_size(spec)
+    chart = st.vega_lite_chart(None, spec, use_container_width=use_container_width)
+    recorder.record(
+        Event(
+            "chart",
+            chart_id,
+            (time.perf_counter() - start) * 1000,
+            "hit" if hit else "miss",
+            rows,
+            arrow_bytes,
+        )
     )
-    chart = st.altair_chart(chart + text) if show_percentage else st.altair_chart(chart)
     return chart
 
 
-def property_to_histogram_by_veiculacoes(
+def get_indicators() -> dict[str, int]:
+    return query(queries["indicators"]).row(0, named=True)
+
+
+def get_df_properties() -> pl.DataFrame:
+    return query(queries["properties"])
+
+
+def get_df_property(property: str) -> pl.DataFrame:
+    return property_frame(get_df_properties(), property)
+
+
+def get_df_anuncios_by_property(property):
+    return anuncios_by_property(get_df_properties(), property)
+
+
+def get_df_veiculacoes_by_property(property):
+    return veiculacoes_by_property(get_df_properties(), property)
+
+
+def property_to_histogram_by_anuncios(
     property: str,
     title: str | None = None,
     show_percentage: bool | None = True,
@@ -181,59 +290,66 @@ def property_to_histogram_by_veiculacoes(
     top_k=None,
     is_sum=True,
 ):
-    total_anuncios = con.sql("""select count(*) from veiculacoes""").pl()[0, 0]
-
-    if show_percentage is None:
-        show_percentage = True
-
-    x = alt.X(property, title="", sort="-x" if invert_axis else "-y")
-    y = alt.Y("Veiculações", title="Veiculações")
-
-    dx, dy = 0, -10
-
-    if invert_axis:
-        x, y = y, x
-        dx, dy = 15, dx
-
-    df_property = get_df_veiculacoes_by_property(property)
-
-    # total_anuncios = df_property.select(pl.col("Anúncios").sum()).to_numpy()[0][0]
-    df_property = df_property.with_columns(
-        (pl.col("Veiculações") / total_anuncios * 100).alias("percent_full")
-    )
+    def build():
+        return property_histogram(
+            get_df_anuncios_by_property(property),
+            property,
+            "Anúncios",
+            get_indicators()["anuncios_analisados"],
+            title,
+            show_percentage,
+            invert_axis,
+            top_k,
+        )
 
-    df_property = df_property.with_columns(
-        (pl.col("percent_full").round(2).cast(pl.Utf8) + "%").alias("percent_full_str"),
-        (pl.col("percent_full").round(0).cast(pl.Int32).cast(pl.Utf8) + "%").alias(
-            "percent_str"
+    return cached_chart(
+        repr(
+            (
+                "property_to_histogram_by_anuncios",
+                property,
+                title,
+                show_percentage,
+                invert_axis,
+                top_k,
+            )
         ),
+        build,
     )
-    if top_k:
-        df_property = df_property.top_k(k=top_k, by="Veiculações")
-
-    chart = (
-        alt.Chart(df_property.to_pandas())
-        .mark_bar()
-        .encode(
-            x=x,
-            y=y,
-            color=alt.Color(value=color_scale[1]),
-            tooltip=[
-                alt.Tooltip(property, title=property),
-                alt.Tooltip("Veiculações", title="Veiculações"),
-                alt.Tooltip("percent_full_str", title="Percentual"),
-            ],
+
+
+def property_to_histogram_by_veiculacoes(
+    property: str,
+    title: str | None = None,
+    show_percentage: bool | None = True,
+    invert_axis: bool | None = None,
+    top_k=None,
+    is_sum=True,
+):
+    def build():
+        return property_histogram(
+            get_df_veiculacoes_by_property(property),
+            property,
+            "Veiculações",
+            get_indicators()["veiculacoes"],
+            title,
+            show_percentage,
+            invert_axis,
+            top_k,
         )
-        .properties(title=title if title else property)
-    )
 
-    text = (
-        alt.Chart(df_property)
-        .mark_text(dx=dx, dy=dy, color="black", fontSize=12)
-        .encode(x=x, y=y, text=alt.Text("percent_str"))
+    return cached_chart(
+        repr(
+            (
+                "property_to_histogram_by_veiculacoes",
+                property,
+                title,
+                show_percentage,
+                invert_axis,
+                top_k,
+            )
+        ),
+        build,
     )
-    chart = st.altair_chart(chart + text) if show_percentage else st.altair_chart(chart)
-    return chart
 
 
 def custom_metric(label: str, value) -> None:
@@ -260,33 +376,7 @@ def custom_metric(label: str, value) -> None:
 
 
 def st_dataframe_from_property(property: str, property_title=None, height=260):
-    property_title: str = property_title if property_title else property
-    df = (
-        con.sql(f"""
-    select
-        {property} as '{property_title}',
-        count(distinct Identificador) as Anúncios,
-        count(distinct ano_edicao ||Identificador) as Veiculações,
-        count(distinct Identificador) * count(distinct ano_edicao ||Identificador) as Prevalência
-
-    from
-        {property}
-    left join
-        veiculacoes using(Identificador)
-    left join
-        anuncios using(Identificador)
-    group by
-        {property}
-    order by
-        Prevalência desc
-    """)
-        .pl()
-        .with_columns(
-            (pl.col("Prevalência") * 100 / pl.col("Prevalência").max()).alias(
-                "Prevalência"
-            )
-        )
-    )
+    df = property_table(get_df_properties(), property, property_title)
     st_df = st.dataframe(
         df,
         hide_index=True,
@@ -309,210 +399,46 @@ def st_dataframe_from_property(property: str, property_title=None, height=260):
     return st_df
 
 
-total_editions = con.query("""
-                        select
-                            count(distinct ano_edicao)
-                        from
-                            veiculacoes
-                        """).pl()[0, 0]
-
-total_ads = con.query("""
-                        select
-                            count(distinct Identificador)
-                        from
-                            veiculacoes
-                        """).pl()[0, 0]
-
-total_ads_single_products = con.query("""
-                        select
-                            count(distinct Identificador)
-                        from
-                            anuncios
-                        """).pl()[0, 0]
-
-total_unique_producs = con.query("""
-    select
-        count(distinct Identificador)
-    from
-        anuncios
-    where
-        "Original (primeira aparição)" is null
-    """).pl()[0, 0]
-
-total_placements = con.query("""
-                        select
-                            count(*)
-                        from
-                            veiculacoes
-                        """).pl()[0, 0]
-
-df_substances = con.query("""
-    select
-        substancias as Substâncias,
-        count(distinct Identificador) as Anúncios
-    from
-        substancias
-    left join
-        anuncios using(Identificador)
-    group by
-        substancias
-    order by
-        Anúncios desc
-    """).pl()
-
-df_pharmacists = con.query("""
-    select
-        responsavel_tecnico as Farmacêutico,
-        count(distinct Identificador) as Anúncios
-    from
-        responsavel_tecnico
-    left join
-        anuncios using(Identificador)
-    group by
-        responsavel_tecnico
-    order by
-        Anúncios desc
-                        """).pl()
-
-df_product_types = con.query("""
-    select
-        tipo_de_produto as 'Tipo de Produto',
-        count(distinct Identificador) as Anúncios
-    from
-        tipo_de_produto
-    left join
-        anuncios using(Identificador)
-    group by
-        tipo_de_produto
-    order by
-        Anúncios desc
-                        """).pl()
-
-df_ads = con.sql("""
-    select
-        image_url as 'Anúncio',
-        "Produto ofertado (título completo)",
-        count(distinct ano_edicao || Identificador) as Veiculações,
-        group_concat(distinct Orientação) as 'Orientações',
-        group_concat(distinct doenca_mencionada) as Moléstias,
-        group_concat(Orientação) as 'Orientações Detalhadas',
-        Identificador,
-    from
-        veiculacoes
-    left join
-        anuncios using(Identificador)
-    left join
-        doenca_mencionada using(Identificador)
-    group by
-        Identificador,
-        image_url,
-        "Produto ofertado (título completo)"
-    order by
-        Veiculações desc
-    """).pl()
-
-df_ads_by_edition = con.sql("""
-    select
-        Ano as ano,
-        ano_edicao,
-        count(*) as anuncios,
-        min(Página) as pagina_primeiro_anuncio,
-        max(Página) as pagina_ultimo_anuncio,
-    from veiculacoes
-    group by
-        ano,
-        ano_edicao
-    order by
-        ano_edicao
-    """).pl()
-
-df_ads_by_page = con.sql("""
-    select
-        "Página",
-        count(*) anuncios
-    from veiculacoes
-    group by
-        "Página"
-    order by
-        "Página"
-    """).pl()
-
-df_ad_edition_page = con.query("""
-    select
-        Ano,
-        ano_edicao,
-        Página
-    from veiculacoes
-    """).pl()
-
-df_disease_count_per_ad = con.query("""
-    select
-        Ano,
-        ano_edicao,
-
-    from veiculacoes
-    """).pl()
-
-df_ailments_count_per_ad = con.sql("""
-    select
-        Identificador as anuncio,
-        count(distinct
-            case when doenca_mencionada = 'Ausente' then null
-            else doenca_mencionada
-            end
-        ) as molestias
-    from
-        anuncios
-    left join
-        doenca_mencionada using(Identificador)
-    group by
-        Identificador
-""").pl()
-
-df_ailments_per_ad = con.sql("""
-    select
-        doenca_mencionada as Moléstia,
-        count(distinct Identificador) as Anúncios,
-        count(distinct ano_edicao) as Veiculações,
-        count(distinct Identificador) * count(distinct ano_edicao) as Prevalência
-    from
-        doenca_mencionada
-    left join
-        veiculacoes using(Identificador)
-    group by
-        doenca_mencionada
-    order by
-        Anúncios desc
-""").pl()
-
-
-tab_main, tab_dicourse, tab_graphics, tab_extras, tab_links = st.tabs(
-    ["Geral", "Discurso", "Gráfico", "Extras", "Links"]
-)
+def render_main():
+    frames = query_many(section_queries["Geral"])
+    indicators = get_indicators()
 
+    df_ads = frames["ads"]
+    df_ads_by_edition = frames["ads_by_edition"]
+    df_placements_per_page = frames["placements_per_page"]
 
-with tab_main:
     col1, col2, col3 = st.columns(3)
     with col1:
-        custom_metric("Edições", total_editions)
+        custom_metric("Edições", indicators["edicoes"])
     with col2:
-        custom_metric("Veiculações", total_placements)
+        custom_metric("Veiculações", indicators["veiculacoes"])
     with col3:
-        custom_metric("Anúncios Fármacos", total_ads)
+        custom_metric("Anúncios Fármacos", indicators["anuncios_veiculados"])
 
     with col1:
-        custom_metric("Anúncios Analisados", total_ads_single_products)
+        custom_metric("Anúncios Analisados", indicators["anuncios_analisados"])
     with col2:
-        custom_metric("Produtos", total_unique_producs)
+        custom_metric("Produtos", indicators["produtos"])
     with col3:
-        custom_metric("Tipos de Produto", df_product_types["Tipo de Produto"].count())
+        custom_metric("Tipos de Produto", indicators["tipos_de_produto"])
 
     with col1:
-        custom_metric("Moléstias", df_ailments_per_ad["Moléstia"].unique().count())
+        custom_metric("Moléstias", indicators["molestias"])
     with col2:
-        custom_metric("Substâncias", df_substances["Substâncias"].count())
+        custom_metric("Substâncias", indicators["substancias"])
     with col3:
-        custom_metric("Farmacéuticos", df_pharmacists["Farmacêutico"].count())
+        custom_metric("Farmacéuticos", indicators["farmaceuticos"])
+
+    search = st.text_input(
+        "Buscar anúncios",
+        placeholder="Título, primeiras palavras, palavras-chave ou substâncias",
+        key="busca",
+    )
+    if search:
+        df_ads = search_ads(search, df_ads)
+        st.caption(f"{df_ads.height} anúncios encontrados")
+    if st.toggle("Agrupar variantes", key="agrupar_variantes"):
+        df_ads = group_variants(df_ads, frames["variant_groups"])
 
     ads = st.dataframe(
         df_ads,
@@ -523,95 +449,45 @@ with tab_main:
         },
     )
 
-    ads_per_edition = (
-        alt.Chart(df_ads_by_edition)
-        .mark_circle(size=120)
-        .encode(
-            x=alt.X("ano_edicao").title("Edição"),
-            y=alt.Y("anuncios").title("Contagem Anúncios"),
-            color=alt.Color("ano:N").scale(range=color_scale),
-        )
-        .properties(title="Veiculação por Edição")
-    )
-    st.altair_chart(ads_per_edition, use_container_width=True)
-
-    df = con.sql("""
-            with quantidade_paginas as (
-                select
-                    max(Página) as total_paginas
-                from
-                    veiculacoes
-                group by
-                    ano_edicao
-            )
-            select
-                total_paginas as 'Total de Páginas',
-                count(*) as Edições
-            from
-                quantidade_paginas
-            group by
-                total_paginas
-        """).pl()
-    st.altair_chart(df_to_histogram(df, "Total de Páginas", "Edições"))
-
-    ads_per_page_year = alt.Chart(df_ad_edition_page).mark_bar().transform_aggregate(
-        count="count()", groupby=["Ano", "Página"]
-    ).encode(
-        x=alt.X("Página:N").axis(labelAngle=0),
-        y=alt.Y("sum(count):Q", title="Veiculações"),
-        color=alt.Color("Ano:N").scale(range=color_scale),
-    ).properties(title="Veiculações por página") + alt.Chart(
-        df_ad_edition_page
-    ).transform_aggregate(count="count()", groupby=["Ano", "Página"]).mark_text(
-        align="center",
-        baseline="middle",
-        dy=-10,  # adjust vertical position of the text
-    ).encode(
-        x=alt.X("Página:N"), y=alt.Y("sum(count):Q"), text=alt.Text("sum(count):Q")
-    )
-    _ = st.altair_chart(ads_per_page_year, use_container_width=True)
-
-with tab_dicourse:
-    _ = st.altair_chart(
-        df_to_histogram_count_by_x(
-            df_ailments_count_per_ad, "molestias", "Contagem de moléstias", "Anúncios"
-        )
+    cached_chart(
+        "ads_per_edition",
+        lambda: ads_per_edition_chart(df_ads_by_edition),
+        use_container_width=True,
     )
 
-    _ = st_dataframe_from_property("doenca_mencionada", "Moléstia mencionada")
-
-    ailments_per_ad = (
-        alt.Chart(df_ailments_per_ad)
-        .mark_circle(size=200)
-        .encode(
-            x=alt.X("Anúncios"),
-            y=alt.Y("Veiculações"),
-            text="Moléstia",
-            tooltip=["Moléstia", "Anúncios", "Veiculações"],
-            color=alt.Color(
-                "Moléstia", scale=alt.Scale(range=color_scale), legend=None
-            ),
-        )
-    ).properties(title="Moléstias por veiculações e anúncios")
-    _ = st.altair_chart(ailments_per_ad)
+    cached_chart(
+        "pages_per_edition",
+        lambda: df_to_histogram(
+            frames["pages_per_edition"], "Total de Páginas", "Edições"
+        ),
+    )
 
-    df_top_ailments = df_ailments_per_ad.top_k(100, by="Prevalência")
-    base = alt.Chart(df_top_ailments).encode(
-        x=alt.X("Moléstia:N", sort=alt.SortField(field="Anúncios", order="descending"))
+    _ = cached_chart(
+        "placements_per_page",
+        lambda: placements_per_page_chart(df_placements_per_page),
+        use_container_width=True,
     )
-    bar1 = base.mark_bar(color=color_scale[1]).encode(
-        y=alt.Y("Anúncios:Q").axis(titleColor=color_scale[1], orient="left"),
-        tooltip=["Moléstia", "Anúncios", "Veiculações"],
+
+
+def render_discourse():
+    frames = query_many(section_queries["Discurso"])
+    df_ailments_count_per_ad = frames["ailments_count_per_ad"]
+    df_ailments_per_ad = frames["ailments_per_ad"]
+
+    _ = cached_chart(
+        "ailments_count_per_ad",
+        lambda: df_to_histogram_count_by_x(
+            df_ailments_count_per_ad, "molestias", "Contagem de moléstias", "Anúncios"
+        ),
     )
-    bar2 = base.mark_bar(color=color_scale[3]).encode(
-        y=alt.Y("Veiculações:Q").axis(titleColor=color_scale[3], orient="right"),
-        tooltip=["Moléstia", "Anúncios", "Veiculações"],
+
+    _ = st_dataframe_from_property("doenca_mencionada", "Moléstia mencionada")
+
+    _ = cached_chart(
+        "ailments_per_ad", lambda: ailments_per_ad_chart(df_ailments_per_ad)
     )
-    final_chart = (
-        alt.layer(bar2, bar1).resolve_scale(y="independent").configure_mark(opacity=0.6)
-    ).properties(title="Moéstias por veiculações e anúncios")
 
-    _ = st.altair_chart(final_chart)
+    _ = cached_chart("top_ailments", lambda: top_ailments_chart(df_ailments_per_ad))
 
     _ = property_to_histogram_by_anuncios(
         "primeiras_palavras_do_anuncio",
@@ -625,46 +501,8 @@ with tab_dicourse:
         "primeiras_palavras_do_anuncio", "Primeiras palavras", height=195
     )
 
-    df = con.sql("""
-        with autorizacoes as (
-        select
-            Identificador,
-            case
-                when autorizacoes = 'Ausente' then 'Ausente'
-                when autorizacoes = 'Governo Imperial' then 'Governo Imperial'
-                when autorizacoes = 'Pharmacopéa official da França' then 'Pharmacopéa official da França'
-                when autorizacoes = 'Academia de Medicina de Paris' then 'Academia de Medicina de Paris'
-                else 'Exma. Junta Central de Hygiene'
-            end as Autoridade,
-            case
-                when autorizacoes = 'Ausente' then 'Ausente'
-                else 'Presente'
-            end as Autorização
-        from
-            autorizacoes
-        )
-        select
-            Autoridade,
-            Autorização,
-            count(distinct Identificador) as Anúncios,
-        from anuncios
-        left join
-            autorizacoes using(Identificador)
-        group by
-            Autorização, Autoridade
-    """)
-    x_col = "Autorização"
-    y_col = "Anúncios"
-    color_col = "Autoridade"
-    _ = st.altair_chart(
-        alt.Chart(df)
-        .mark_bar()
-        .encode(
-            x=alt.X(f"{x_col}:N", axis=alt.Axis(labelAngle=0)),
-            y=alt.X(f"{y_col}"),
-            color=alt.Color(color_col, scale=alt.Scale(range=color_scale[1:])),
-        )
-        .properties(title="Menção à autorização")
+    _ = cached_chart(
+        "authorizations", lambda: authorizations_chart(frames["authorizations"])
     )
 
     _ = property_to_histogram_by_anuncios(
@@ -680,11 +518,6 @@ with tab_dicourse:
     _ = st_dataframe_from_property(
         "palavras_chave_produto", "Palavra-chave produto", height=195
     )
-    discourse_analysis = [
-        ["discursos_de_autoridade", "Discursos de autoridade", "True", "True", 10],
-        ["publico_mencionado", "Público mencionado", True, True, None],
-        # ["origem", "Origem", True, False],
-    ]
 
     for prop in discourse_analysis:
         column, title, show_percentage, invert_axis, top_k = (prop + [None] * 5)[:5]
@@ -698,67 +531,155 @@ with tab_dicourse:
     _ = st_dataframe_from_property("mencoes_a_lugares", "Lugar mencionado", height=250)
 
 
-with tab_graphics:
-    df = con.sql("""
-    select
-        "Quantidade de variações tipográficas (aprox.)" as 'Quantidade de variações tipográficas',
-        count(distinct Identificador) as Anúncios,
-    from
-        anuncios
-    group by
-        "Quantidade de variações tipográficas (aprox.)"
-    """).pl()
-    _ = st.altair_chart(
-        df_to_histogram(df, "Quantidade de variações tipográficas", "Anúncios")
-    )
-    graphical_analysis = [
-        ["informacoes_indicativas", "Informações indicativas"],
-        ["detalhamento_do_efeito", "Detalhamento do efeito"],
-        ["detalhamento_forma_de_uso", "Detalhamento da forma de uso"],
-        ["variacao_typeface", "Variação de typeface"],
-        ["variacao_tipografica", "Variação tipográfica", True, True],
-        ["alinhamento", "Alinhamento"],
-        ["diagramacao", "Diagramação", True, True],
-        ["hieraquia_da_informacao", "Hierarquia da informação", True, True],
-        ["elementos_de_composicao", "Elementos de composição"],
-        ["sinal_visual_de_autoridade", "Sinal visual de autoridade"],
-    ]
+def render_graphics():
+    frames = query_many(section_queries["Gráfico"])
+    _ = cached_chart(
+        "typographic_variations",
+        lambda: df_to_histogram(
+            frames["typographic_variations"],
+            "Quantidade de variações tipográficas",
+            "Anúncios",
+        ),
+    )
     for prop in graphical_analysis:
         column, title, show_percentage, invert_axis = (prop + [None] * 4)[:4]
         _ = property_to_histogram_by_anuncios(
             column, title, show_percentage, invert_axis
         )
 
-    df = con.sql("""
-    with presenca_imagem as (
-    select
-        case
-            when tipificacao_da_imagem_aprox = 'Ausente' then 'Ausente'
-            else 'Presente'
-        end as 'Presença de imagem',
-        Identificador
-    from tipificacao_da_imagem_aprox
-    )
-    select
-        "Presença de imagem",
-        count(distinct Identificador) as Anúncios
-    from
-        presenca_imagem
-    group by
-        "Presença de imagem"
-    """).pl()
-    _ = st.altair_chart(df_to_histogram(df, "Presença de imagem", "Anúncios"))
+    _ = cached_chart(
+        "image_presence",
+        lambda: df_to_histogram(
+            frames["image_presence"], "Presença de imagem", "Anúncios"
+        ),
+    )
     _ = st_dataframe_from_property(
         "tipificacao_da_imagem_aprox", "Tipificação da imagem"
     )
 
 
-with tab_extras:
+def render_extras():
+    _ = query_many(section_queries["Extras"])
     _ = st_dataframe_from_property("tipo_de_produto", "Tipo de produto")
     _ = st_dataframe_from_property("substancias", "Substância")
     _ = st_dataframe_from_property("responsavel_tecnico", "Responsável técnico")
+    render_cooccurrence()
+
+
+def render_cooccurrence():
+    props = list(property_labels)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        a = st.selectbox(
+            "Linhas",
+            props,
+            index=props.index("doenca_mencionada"),
+            format_func=property_labels.get,
+            key="coocorrencia_linhas",
+        )
+    with col2:
+        b = st.selectbox(
+            "Colunas",
+            props,
+            index=props.index("substancias"),
+            format_func=property_labels.get,
+            key="coocorrencia_colunas",
+        )
+    with col3:
+        metric = st.selectbox("Medida", metrics, key="coocorrencia_medida")
+
+    start = time.perf_counter()
+    index = get_cooccurrence_index(db_fingerprint(db_path))
+    df = index.matrix(a, b, cross_filter)
+    recorder.record(
+        Event(
+            "cooccurrence",
+            f"{a} {b}",
+            (time.perf_counter() - start) * 1000,
+            "-",
+            df.height,
+            df.estimated_size(),
+        )
+    )
+    _ = cached_chart(
+        f"cooccurrence {a} {b} {metric}",
+        lambda: cooccurrence_heatmap(
+            df, property_labels[a], property_labels[b], metric
+        ),
+        use_container_width=True,
+    )
 
-with tab_links:
+
+def render_filters() -> CrossFilter:
+    editions = query(queries["ads_by_edition"], cross_filtered=False)["ano_edicao"]
+    placements = query(queries["placements_per_page"], cross_filtered=False)
+    properties = query(queries["properties"], cross_filtered=False)
+
+    with st.sidebar:
+        st.header("Filtros")
+        years = st.multiselect(
+            "Ano", placements["Ano"].unique().sort().to_list(), key="filtro_anos"
+        )
+        first, last = st.select_slider(
+            "Edições",
+            editions.to_list(),
+            value=(editions[0], editions[-1]),
+            key="filtro_edicoes",
+        )
+        pages = st.multiselect(
+            "Página",
+            placements["Página"].unique().sort().to_list(),
+            key="filtro_paginas",
+        )
+        chosen = st.multiselect(
+            "Propriedades",
+            properties["propriedade"].unique().sort().to_list(),
+            format_func=lambda prop: property_labels.get(prop, prop),
+            key="filtro_propriedades",
+        )
+        values = []
+        for prop in chosen:
+            selected = st.multiselect(
+                property_labels.get(prop, prop),
+                property_frame(properties, prop)["valor"].to_list(),
+                key=f"filtro_{prop}",
+            )
+            if selected:
+                values.append((prop, tuple(selected)))
+
+    full_range = (first, last) == (editions[0], editions[-1])
+    return CrossFilter(
+        tuple(years),
+        None if full_range else (first, last),
+        tuple(pages),
+        tuple(values),
+    )
+
+
+def render_debug_panel(rerun_totals: dict[str, dict], session: dict) -> None:
+    scopes = {"Rerun": rerun_totals, "Sessão": session["totals"]}
+    with st.expander("Instrumentação", expanded=True):
+        st.caption(
+            f"Rerun em {recorder.elapsed_ms():.0f} ms · {session['reruns']} reruns na sessão"
+        )
+        st.dataframe(
+            pl.DataFrame(
+                [
+                    {"Escopo": scope, "Tipo": kind, **values}
+                    for scope, totals in scopes.items()
+                    for kind, values in totals.items()
+                ]
+            ),
+            hide_index=True,
+        )
+        if recorder.events:
+            st.dataframe(
+                pl.DataFrame(recorder.events).sort("wall_ms", descending=True),
+                hide_index=True,
+            )
+
+
+def render_links():
     st.markdown(
         "[🗃️ Ficha de catálogo](https://docs.google.com/spreadsheets/d/1Be14RT5XPDtsarD1-NpYpkqV5BgyXIQQFt36iCaCsY4/edit?usp=sharing)"
     )
@@ -774,3 +695,30 @@ with tab_links:
     st.markdown(
         "[📰 Jornais de Campos dos Goytacazes](https://docs.google.com/spreadsheets/d/1FcaQgNfmki29YI9Jb6SX3lyNIrBZ-2GsxCZX21ZYHQE/edit?usp=sharing)"
     )
+
+
+sections = {
+    "Geral": render_main,
+    "Discurso": render_discourse,
+    "Gráfico": render_graphics,
+    "Extras": render_extras,
+    "Links": render_links,
+}
+
+section = st.segmented_control(
+    "Seção",
+    list(sections),
+    default="Geral",
+    key="section",
+    label_visibility="collapsed",
+)
+section = section if section else "Geral"
+cross_filter = render_filters()
+sections[section]()
+
+rerun_totals = recorder.finish(section)
+session = st.session_state.setdefault("instrumentation", {"reruns": 0, "totals": {}})
+session["reruns"] += 1
+session["totals"] = merge_totals(session["totals"], rerun_totals)
+if st.query_params.get("debug") == "1":
+    render_debug_panel(rerun_totals, session)
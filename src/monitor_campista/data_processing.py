@@ -0,0 +1,1232 @@
+import argparse
+import hashlib
+import inspect
+import os
+import shutil
+import sqlite3
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+import duckdb
+import polars as pl
+
+import minhash
+from minhash import variant_clusters
+from queries import queries
+from snapshot import is_snapshot_fresh, write_snapshot
+
+bronze_dir = Path("data/01_bronze")
+silver_dir = Path("data/02_silver")
+gold_dir = Path(os.environ.get("MONITOR_CAMPISTA_GOLD_DIR", "data/03_gold"))
+db_name = "monitor_campista_pharma_ads_1880_1884"
+gold_db_path = gold_dir / f"{db_name}.duckdb"
+
+schema_analysis_sheet = [
+    # a. Identificação do objeto
+    "Identificador",
+    "ID",
+    "Link",
+    "Produto ofertado (título completo)",
+    "Primeiras palavras do anúncio",
+    "Doença mencionada",
+    "Tipo de produto",
+    "Substâncias",
+    "Extras",
+    # b. Indentificação do contexto
+    "Informações indicativas",
+    "Menções a lugares",
+    "Origem",
+    "Preço",
+    "Responsável técnico",
+    "Comercialização",
+    "Depósito",
+    "Produção",
+    # c. Identificação do discurso
+    "Palavra-chave efeito",
+    "Palavras-chave produto",
+    "Discursos de autoridade",
+    "Público mencionado",
+    "Detalhamento do efeito",
+    "Detalhamento forma de uso",
+    "Autorizações",
+    "Observações",
+    # d. Identificação gráfica
+    "Sinal visual de autoridade",
+    "Quantidade de variações tipográficas (aprox.)",
+    "Variação typeface",
+    "Variação tipográfica",
+    "Alinhamento",
+    "Diagramação",
+    "Hieraquia da informação",
+    "Tipificação da imagem (aprox.)",
+    "Elementos de composição",
+    #
+    "Original (primeira aparição)",
+    "Derivados",
+    "Status",
+    "Dúvidas",
+]
+
+multi_select_columns = [
+    "Primeiras palavras do anúncio",
+    "Doença mencionada",
+    "Tipo de produto",
+    "Substâncias",
+    "Extras",
+    # b. Indentificação do contexto
+    "Informações indicativas",
+    "Menções a lugares",
+    "Origem",
+    "Responsável técnico",
+    # c. Identificação do discurso
+    "Palavra-chave efeito",
+    "Palavras-chave produto",
+    "Discursos de autoridade",
+    "Público mencionado",
+    "Detalhamento do efeito",
+    "Detalhamento forma de uso",
+    "Autorizações",
+    # d. Identificação gráfica
+    "Sinal visual de autoridade",
+    "Variação typeface",
+    "Variação tipográfica",
+    "Alinhamento",
+    "Diagramação",
+    "Hieraquia da informação",
+    "Tipificação da imagem (aprox.)",
+    "Elementos de composição",
+]
+
+single_value_columns = [
+    col for col in schema_analysis_sheet if col not in multi_select_columns
+]
+
+schema_ad_insertions = [
+    "Anúncio",
+    "Ano",
+    "Edição",
+    "Página",
+    "Coluna(s) ocupadas",
+    "Número de Colunas",
+    "Orientação",
+]
+
+
+accents, unaccented = "çõãóéíâáú", "coaoeiaau"
+
+
+def clean_text(text: str) -> str:
+    translation_table = str.maketrans(" -" + accents, "__" + unaccented, "().")
+    return text.lower().translate(translation_table)
+
+
+def search_terms(text: pl.Expr) -> pl.Expr:
+    """Splits text into lowercase words, folding accents the same way as clean_text."""
+    return (
+        text.str.to_lowercase()
+        .str.replace_many(list(accents), list(unaccented))
+        .str.extract_all(r"\w+")
+    )
+
+
+property_tables = [clean_text(col) for col in multi_select_columns]
+
+
+def read_ad_analysis(path: Path) -> pl.DataFrame:
+    return (
+        pl.read_csv(path)
+        .select(
+            [
+                pl.col(c).str.split(", ").alias(c)
+                if c in multi_select_columns
+                else pl.col(c)
+                for c in schema_analysis_sheet
+            ]
+        )
+        .filter(pl.col("Status").eq("Finalizado"))
+    )
+
+
+def read_ad_insertions(path: Path) -> pl.DataFrame:
+    return pl.read_csv(path).select(schema_ad_insertions)
+
+
+def build_property_table(ad_analysis: pl.DataFrame, col: str) -> pl.DataFrame:
+    return (
+        ad_analysis.select(["Identificador", col])
+        .explode(col)
+        .unique()
+        .drop_nulls()
+        .rename({col: clean_text(col)})
+    )
+
+
+def build_anuncios(ad_analysis: pl.DataFrame) -> pl.DataFrame:
+    return ad_analysis.select(single_value_columns).with_columns(
+        (
+            pl.lit("https://drive.google.com/thumbnail?id=")
+            + pl.col("Link").str.extract(r"([-\w]{25,})")
+            + pl.lit("&sz=w1920")
+        ).alias("image_url")
+    )
+
+
+def build_original(ad_analysis: pl.DataFrame) -> pl.DataFrame:
+    return (
+        ad_analysis.select(["Identificador", "Original (primeira aparição)"])
+        .unique()
+        .drop_nulls()
+        .with_columns(pl.col("Original (primeira aparição)").str.split(" ").list.get(0))
+    )
+
+
+def build_veiculacoes(ad_insertions: pl.DataFrame) -> pl.DataFrame:
+    return (
+        ad_insertions.filter(pl.col("Anúncio").is_not_null())
+        .rename({"Anúncio": "Identificador"})
+        .with_columns(
+            pl.format(
+                "{}_{}", pl.col("Ano"), pl.col("Edição").cast(pl.Utf8).str.zfill(3)
+            ).alias("ano_edicao")
+        )
+    )
+
+
+@dataclass(frozen=True)
+class BronzeSource:
+    file_name: str
+    read: Callable[[Path], pl.DataFrame]
+    schema: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class GoldTable:
+    name: str
+    source: str
+    build: Callable[..., pl.DataFrame]
+    args: tuple = ()
+
+
+bronze_sources = {
+    "ad_analysis": BronzeSource(
+        "notion_ficha_analise.csv",
+        read_ad_analysis,
+        (*schema_analysis_sheet, *multi_select_columns),
+    ),
+    "ad_insertions": BronzeSource(
+        "sheets_ficha_registro_veiculacoes.csv",
+        read_ad_insertions,
+        tuple(schema_ad_insertions),
+    ),
+}
+
+gold_tables = [
+    *[
+        GoldTable(clean_text(col), "ad_analysis", build_property_table, (col,))
+        for col in multi_select_columns
+    ],
+    GoldTable("anuncios", "ad_analysis", build_anuncios),
+    GoldTable("original", "ad_analysis", build_original),
+    GoldTable("veiculacoes", "ad_insertions", build_veiculacoes),
+]
+
+
+def build_dimensions(con: duckdb.DuckDBPyConnection) -> None:
+    """Dictionary-encodes ads and editions into integer ids."""
+    con.execute("""
+    create or replace table dim_anuncios as
+    select
+        row_number() over (order by Identificador)::integer as Identificador_id,
+        Identificador
+    from (
+        select Identificador from anuncios
+        union
+        select Identificador from veiculacoes
+    )
+    where
+        Identificador is not null
+    order by
+        Identificador_id
+    """)
+
+    con.execute("""
+    create or replace table dim_edicoes as
+    select
+        row_number() over (order by ano_edicao)::integer as edicao_id,
+        Ano::smallint as Ano,
+        Edição::smallint as Edição,
+        ano_edicao
+    from (
+        select distinct Ano, Edição, ano_edicao from veiculacoes
+    )
+    where
+        ano_edicao is not null
+    order by
+        edicao_id
+    """)
+
+    con.execute("""
+    create or replace table fato_veiculacoes as
+    select
+        row_number() over (
+            order by edicao_id, Página, Identificador_id
+        )::integer as veiculacao_id,
+        edicao_id,
+        Identificador_id,
+        (edicao_id::bigint << 32) | Identificador_id as edicao_anuncio_id,
+        Ano,
+        Página::smallint as Página,
+        Orientação
+    from
+        veiculacoes
+    join
+        dim_edicoes using(Ano, Edição, ano_edicao)
+    join
+        dim_anuncios using(Identificador)
+    order by
+        veiculacao_id
+    """)
+
+
+def build_property_index(con: duckdb.DuckDBPyConnection, properties=None) -> None:
+    """Builds a long (propriedade, value_id, Identificador_id) index of all properties."""
+    properties = properties if properties else property_tables
+
+    property_values = "\nunion all\n".join(
+        f"""
+        select
+            '{property}' as propriedade,
+            {property}::varchar as valor,
+            Identificador
+        from
+            {property}
+        """
+        for property in properties
+    )
+    con.execute(f"""
+    create or replace temp view valores_propriedades as
+    {property_values}
+    """)
+
+    con.execute("""
+    create or replace table dim_valores as
+    select
+        row_number() over (order by propriedade, valor)::integer as value_id,
+        propriedade,
+        valor
+    from (
+        select distinct propriedade, valor from valores_propriedades
+    )
+    order by
+        value_id
+    """)
+
+    con.execute("""
+    create or replace table indice_propriedades as
+    select distinct
+        propriedade,
+        value_id,
+        Identificador_id
+    from
+        valores_propriedades
+    join
+        dim_valores using(propriedade, valor)
+    join
+        dim_anuncios using(Identificador)
+    order by
+        propriedade,
+        value_id,
+        Identificador_id
+    """)
+    con.execute(
+        "create index indice_propriedades_propriedade on indice_propriedades(propriedade)"
+    )
+    con.execute("drop view valores_propriedades")
+
+
+indicators_sql = """
+    with resumo_veiculacoes as (
+        select
+            count(distinct edicao_id) as edicoes,
+            count(*) as veiculacoes,
+            count(distinct Identificador_id) as anuncios_veiculados
+        from
+            fato_veiculacoes
+    ),
+    resumo_anuncios as (
+        select
+            count(distinct Identificador) as anuncios_analisados,
+            count(distinct Identificador)
+                filter (where "Original (primeira aparição)" is null) as produtos
+        from
+            anuncios
+    ),
+    resumo_valores as (
+        select
+            count(*) filter (where propriedade = 'tipo_de_produto') as tipos_de_produto,
+            count(*) filter (where propriedade = 'doenca_mencionada') as molestias,
+            count(*) filter (where propriedade = 'substancias') as substancias,
+            count(*) filter (where propriedade = 'responsavel_tecnico') as farmaceuticos
+        from
+            dim_valores
+    )
+    select
+        *
+    from
+        resumo_veiculacoes,
+        resumo_anuncios,
+        resumo_valores
+"""
+
+
+def build_aggregate_tables(con: duckdb.DuckDBPyConnection) -> None:
+    """Materializes the counts shown by the dashboard so it only needs lookups."""
+    con.execute("""
+    create or replace table agg_propriedades (
+        propriedade varchar,
+        valor varchar,
+        Anúncios bigint,
+        Veiculações bigint,
+        Prevalência bigint,
+        primary key (propriedade, valor)
+    )
+    """)
+    con.execute("""
+    insert into agg_propriedades
+    with contagens as (
+        select
+            value_id,
+            count(distinct Identificador_id) as Anúncios,
+            count(distinct edicao_anuncio_id) as Veiculações
+        from
+            indice_propriedades
+        left join
+            fato_veiculacoes using(Identificador_id)
+        group by
+            value_id
+    )
+    select
+        propriedade,
+        valor,
+        Anúncios,
+        Veiculações,
+        Anúncios * Veiculações as Prevalência
+    from
+        contagens
+    join
+        dim_valores using(value_id)
+    order by
+        propriedade,
+        valor
+    """)
+
+    con.execute("""
+    create or replace table agg_edicoes as
+    select
+        Ano as ano,
+        ano_edicao,
+        anuncios,
+        pagina_primeiro_anuncio,
+        pagina_ultimo_anuncio,
+    from (
+        select
+            edicao_id,
+            count(*) as anuncios,
+            min(Página) as pagina_primeiro_anuncio,
+            max(Página) as pagina_ultimo_anuncio,
+        from fato_veiculacoes
+        group by
+            edicao_id
+    )
+    join
+        dim_edicoes using(edicao_id)
+    order by
+        edicao_id
+    """)
+
+    con.execute("""
+    create or replace table agg_paginas as
+    select
+        Ano,
+        Página,
+        count(*) as Veiculações
+    from fato_veiculacoes
+    group by
+        Ano,
+        Página
+    order by
+        Ano,
+        Página
+    """)
+
+    con.execute(f"""
+    create or replace table agg_indicadores as
+    {indicators_sql}
+    """)
+
+
+search_fields = {
+    "Produto ofertado (título completo)": 3.0,
+    "Primeiras palavras do anúncio": 2.0,
+    "Palavra-chave efeito": 1.0,
+    "Palavras-chave produto": 1.0,
+    "Substâncias": 1.0,
+}
+
+
+def build_search_index(con: duckdb.DuckDBPyConnection) -> None:
+    """Builds an inverted (termo, Identificador_id, peso) index of the searchable fields.
+
+    A word weighs the sum of the weights of the fields it appears in for that ad."""
+    field_texts = "\nunion all\n".join(
+        f"""
+        select
+            '{col}' as campo,
+            {weight}::double as peso,
+            Identificador,
+            "{col}"::varchar as texto
+        from
+            anuncios
+        """
+        if col in single_value_columns
+        else f"""
+        select
+            '{col}' as campo,
+            {weight}::double as peso,
+            Identificador,
+            {clean_text(col)}::varchar as texto
+        from
+            {clean_text(col)}
+        """
+        for col, weight in search_fields.items()
+    )
+    words = (
+        con.sql(field_texts)
+        .pl()
+        .with_columns(search_terms(pl.col("texto")).alias("termo"))
+        .explode("termo")
+        .drop_nulls("termo")
+        .unique(["campo", "Identificador", "termo"])
+        .group_by("termo", "Identificador")
+        .agg(pl.col("peso").sum())
+    )
+    con.register("palavras_busca", words)
+    con.execute("""
+    create or replace table indice_busca as
+    select
+        termo,
+        Identificador_id,
+        peso
+    from
+        palavras_busca
+    join
+        dim_anuncios using(Identificador)
+    order by
+        termo,
+        Identificador_id
+    """)
+    con.unregister("palavras_busca")
+
+
+variant_properties = [
+    "primeiras_palavras_do_anuncio",
+    "doenca_mencionada",
+    "tipo_de_produto",
+    "substancias",
+    "palavras_chave_produto",
+    "responsavel_tecnico",
+]
+variant_threshold = 0.4
+# values that stand for a missing or generic answer, shared by unrelated ads
+variant_placeholders = [
+    "Ausente",
+    "Indefinido",
+    "Outro",
+    "Outros",
+    "Nome do produto",
+    "Produto",
+    "[Moléstia]",
+]
+
+
+def build_variant_groups(con: duckdb.DuckDBPyConnection) -> None:
+    """Clusters ads that are likely variants of one product with MinHash/LSH.
+
+    An ad is the set of its title words and of its values of variant_properties,
+    leaving out placeholder values and one- or two-letter words such as "de"."""
+    titles = con.sql("""
+    select
+        Identificador_id,
+        "Produto ofertado (título completo)" as titulo
+    from
+        anuncios
+    join
+        dim_anuncios using(Identificador)
+    """).pl()
+    values = con.sql(f"""
+    select
+        Identificador_id,
+        propriedade || ':' || valor as token
+    from
+        indice_propriedades
+    join
+        dim_valores using(propriedade, value_id)
+    where
+        propriedade in {tuple(variant_properties)}
+        and valor not in {tuple(variant_placeholders)}
+    """).pl()
+    tokens = pl.concat(
+        [
+            titles.select(
+                "Identificador_id", search_terms(pl.col("titulo")).alias("token")
+            )
+            .explode("token")
+            .filter(pl.col("token").str.len_chars() > 2),
+            values,
+        ]
+    ).unique()
+    con.register("variantes", variant_clusters(tokens, variant_threshold))
+    con.execute("""
+    create or replace table grupos_variantes as
+    select
+        Identificador_id,
+        grupo_id,
+        variantes
+    from
+        variantes
+    order by
+        Identificador_id
+    """)
+    con.unregister("variantes")
+
+
+watermark_columns = ["Ano", "Edição", "Página", "Identificador"]
+
+
+def build_watermark(con: duckdb.DuckDBPyConnection, table: str = "veiculacoes") -> None:
+    """Records the greatest (Ano, Edição, Página, Identificador) key loaded so far."""
+    con.execute(f"""
+    create or replace table pipeline_watermark as
+    select
+        Ano,
+        Edição,
+        Página,
+        Identificador
+    from
+        {table}
+    where
+        Ano is not null and Edição is not null and Página is not null
+    order by
+        Ano desc,
+        Edição desc,
+        Página desc,
+        Identificador desc
+    limit 1
+    """)
+
+
+derived_steps = [
+    build_dimensions,
+    build_property_index,
+    build_aggregate_tables,
+    build_search_index,
+    build_variant_groups,
+    build_watermark,
+]
+
+
+def build_derived_tables(con: duckdb.DuckDBPyConnection) -> None:
+    for step in derived_steps:
+        step(con)
+
+
+def content_hash(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def source_hashes(bronze_dir: Path) -> dict[str, str]:
+    return {
+        name: content_hash(
+            file_hash(bronze_dir / source.file_name),
+            inspect.getsource(source.read),
+            source.schema,
+        )
+        for name, source in bronze_sources.items()
+    }
+
+
+def table_hashes(bronze_dir: Path) -> dict[str, str]:
+    sources = source_hashes(bronze_dir)
+    hashes = {
+        table.name: content_hash(
+            sources[table.source], inspect.getsource(table.build), table.args
+        )
+        for table in gold_tables
+    }
+    hashes["agregados"] = aggregates_hash(hashes)
+    return hashes
+
+
+def aggregates_hash(hashes: dict[str, str]) -> str:
+    return content_hash(
+        [inspect.getsource(step) for step in derived_steps],
+        inspect.getsource(minhash),
+        inspect.getsource(search_terms),
+        indicators_sql,
+        property_tables,
+        search_fields,
+        (accents, unaccented),
+        variant_properties,
+        variant_threshold,
+        variant_placeholders,
+        sorted(hashes.items()),
+    )
+
+
+def read_duckdb_manifest(con: duckdb.DuckDBPyConnection) -> dict[str, str]:
+    con.execute("""
+    create table if not exists pipeline_manifest (
+        table_name varchar primary key,
+        input_hash varchar
+    )
+    """)
+    return dict(con.execute("select * from pipeline_manifest").fetchall())
+
+
+def read_sqlite_manifest(sqlite_path: Path) -> dict[str, str]:
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_con:
+        sqlite_con.execute("""
+        create table if not exists pipeline_manifest (
+            table_name text primary key,
+            input_hash text
+        )
+        """)
+        return dict(sqlite_con.execute("select * from pipeline_manifest").fetchall())
+
+
+def silver_path(silver_dir: Path, table_name: str) -> Path:
+    return silver_dir / f"{table_name}.parquet"
+
+
+def read_silver_hash(path: Path) -> str | None:
+    if not path.exists():
+        return None
+    return pl.read_parquet_metadata(path).get("input_hash")
+
+
+def write_silver_table(path: Path, df: pl.DataFrame, input_hash: str) -> None:
+    tmp_path = path.with_suffix(".parquet.tmp")
+    df.write_parquet(
+        tmp_path,
+        compression="zstd",
+        statistics=True,
+        metadata={"input_hash": input_hash},
+    )
+    tmp_path.replace(path)
+
+
+@contextmanager
+def staged_database(path: Path) -> Iterator[Path]:
+    """Yields a copy of the database at path to write to, moved over path on exit.
+
+    The dashboard keeps the gold DuckDB file open read-only, and its file lock would
+    block a writer opening the same file. Readers keep the replaced file until they
+    reopen the new one. The copy is discarded if the block raises or deletes it."""
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    for src, dst in [(path, tmp_path), (wal_path(path), wal_path(tmp_path))]:
+        dst.unlink(missing_ok=True)
+        if src.exists():
+            shutil.copyfile(src, dst)
+    try:
+        yield tmp_path
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        wal_path(tmp_path).unlink(missing_ok=True)
+        raise
+    if tmp_path.exists():
+        os.replace(tmp_path, path)
+        wal_path(path).unlink(missing_ok=True)
+
+
+def wal_path(path: Path) -> Path:
+    return path.with_suffix(path.suffix + ".wal")
+
+
+def write_duckdb_table(
+    con: duckdb.DuckDBPyConnection, table_name: str, path: Path, input_hash: str
+) -> None:
+    con.begin()
+    con.execute(
+        f"create or replace table {table_name} as "
+        f"select * from read_parquet('{path.as_posix()}')"
+    )
+    con.execute(
+        "insert or replace into pipeline_manifest values (?, ?)",
+        [table_name, input_hash],
+    )
+    con.commit()
+
+
+def write_sqlite_table(
+    sqlite_path: Path, table_name: str, path: Path, input_hash: str
+) -> None:
+    pl.read_parquet(path).write_database(
+        table_name=table_name,
+        connection=f"sqlite:///{sqlite_path.resolve()}",
+        if_table_exists="replace",
+        engine="adbc",
+    )
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_con, sqlite_con:
+        sqlite_con.execute(
+            "insert or replace into pipeline_manifest values (?, ?)",
+            (table_name, input_hash),
+        )
+
+
+def run_pipeline(
+    bronze_dir: Path = bronze_dir,
+    silver_dir: Path = silver_dir,
+    gold_dir: Path = gold_dir,
+    force: bool = False,
+) -> list[str]:
+    """Rebuilds the silver and gold tables whose bronze file or definition changed.
+
+    Bronze CSVs are only parsed for tables whose silver Parquet file is stale; the
+    gold databases are loaded from silver. The dashboard snapshot is rewritten
+    whenever the DuckDB file changed. Returns the names of the rebuilt tables."""
+    silver_dir.mkdir(parents=True, exist_ok=True)
+    gold_dir.mkdir(parents=True, exist_ok=True)
+    duckdb_path = gold_dir / f"{db_name}.duckdb"
+    sqlite_path = gold_dir / f"{db_name}.db"
+
+    hashes = table_hashes(bronze_dir)
+    sources: dict[str, pl.DataFrame] = {}
+    rebuilt = []
+    duckdb_changed = False
+
+    with staged_database(duckdb_path) as staged_path:
+        with duckdb.connect(str(staged_path)) as con:
+            duckdb_manifest = read_duckdb_manifest(con)
+            sqlite_manifest = read_sqlite_manifest(sqlite_path)
+
+            for table in gold_tables:
+                input_hash = hashes[table.name]
+                path = silver_path(silver_dir, table.name)
+                stale_silver = force or read_silver_hash(path) != input_hash
+                stale_duckdb = force or duckdb_manifest.get(table.name) != input_hash
+                stale_sqlite = force or sqlite_manifest.get(table.name) != input_hash
+                if not (stale_silver or stale_duckdb or stale_sqlite):
+                    continue
+
+                if stale_silver:
+                    if table.source not in sources:
+                        source = bronze_sources[table.source]
+                        sources[table.source] = source.read(
+                            bronze_dir / source.file_name
+                        )
+                    df = table.build(sources[table.source], *table.args)
+                    write_silver_table(path, df, input_hash)
+
+                if stale_duckdb:
+                    write_duckdb_table(con, table.name, path, input_hash)
+                    duckdb_changed = True
+                if stale_sqlite:
+                    write_sqlite_table(sqlite_path, table.name, path, input_hash)
+                rebuilt.append(table.name)
+
+            if force or duckdb_manifest.get("agregados") != hashes["agregados"]:
+                con.begin()
+                build_derived_tables(con)
+                con.execute(
+                    "insert or replace into pipeline_manifest values (?, ?)",
+                    ["agregados", hashes["agregados"]],
+                )
+                con.commit()
+                duckdb_changed = True
+                rebuilt.append("agregados")
+
+        if not duckdb_changed:
+            staged_path.unlink()
+
+    snapshot_path = gold_dir / f"{db_name}.arrow"
+    if force or not is_snapshot_fresh(duckdb_path, snapshot_path, queries):
+        write_snapshot(duckdb_path, snapshot_path, queries)
+        rebuilt.append("snapshot")
+
+    return rebuilt
+
+
+def after_watermark(watermark: tuple) -> pl.Expr:
+    """Rows whose (Ano, Edição, Página, Identificador) key sorts after the watermark."""
+    expr = pl.col(watermark_columns[-1]) > watermark[-1]
+    for col, value in zip(watermark_columns[-2::-1], watermark[-2::-1]):
+        expr = (pl.col(col) > value) | ((pl.col(col) == value) & expr)
+    return expr
+
+
+def apply_veiculacoes_delta(con: duckdb.DuckDBPyConnection) -> None:
+    """Loads the rows of novas_veiculacoes into gold and adds their counts to the aggregates.
+
+    New ads and editions take the next ids. Every new row sorts after the watermark, so
+    editions keep their chronological order and only the last loaded edition can already
+    hold some of the new (edition, ad) pairs."""
+    con.execute("insert into veiculacoes by name select * from novas_veiculacoes")
+
+    con.execute("""
+    insert into dim_anuncios
+    select
+        (select coalesce(max(Identificador_id), 0) from dim_anuncios)
+            + row_number() over (order by Identificador)::integer,
+        Identificador
+    from (
+        select distinct Identificador from novas_veiculacoes
+    )
+    where
+        Identificador not in (select Identificador from dim_anuncios)
+    order by
+        Identificador
+    """)
+
+    con.execute("""
+    insert into dim_edicoes
+    select
+        (select coalesce(max(edicao_id), 0) from dim_edicoes)
+            + row_number() over (order by ano_edicao)::integer,
+        Ano::smallint,
+        Edição::smallint,
+        ano_edicao
+    from (
+        select distinct Ano, Edição, ano_edicao from novas_veiculacoes
+    )
+    where
+        ano_edicao is not null
+        and ano_edicao not in (select ano_edicao from dim_edicoes)
+    order by
+        ano_edicao
+    """)
+
+    con.execute("""
+    create or replace temp table delta_fato as
+    select
+        (select coalesce(max(veiculacao_id), 0) from fato_veiculacoes)
+            + row_number() over (order by edicao_id, Página, Identificador_id)::integer
+            as veiculacao_id,
+        edicao_id,
+        Identificador_id,
+        (edicao_id::bigint << 32) | Identificador_id as edicao_anuncio_id,
+        Ano,
+        Página::smallint as Página,
+        Orientação
+    from
+        novas_veiculacoes
+    join
+        dim_edicoes using(Ano, Edição, ano_edicao)
+    join
+        dim_anuncios using(Identificador)
+    order by
+        veiculacao_id
+    """)
+
+    # Distinct counts only grow by the pairs, editions and ads not yet in the fact table.
+    con.execute("""
+    create or replace temp table delta_novos as
+    select
+        edicao_anuncio_id,
+        any_value(Identificador_id) as Identificador_id,
+        any_value(edicao_id) as edicao_id,
+        edicao_anuncio_id not in (
+            select edicao_anuncio_id from fato_veiculacoes
+            where edicao_id in (select edicao_id from delta_fato)
+        ) as novo_par
+    from
+        delta_fato
+    group by
+        edicao_anuncio_id
+    """)
+    con.execute("""
+    update agg_indicadores set
+        edicoes = edicoes + (
+            select count(distinct edicao_id) from delta_fato
+            where edicao_id not in (
+                select edicao_id from fato_veiculacoes
+                where edicao_id in (select edicao_id from delta_fato)
+            )
+        ),
+        veiculacoes = veiculacoes + (select count(*) from delta_fato),
+        anuncios_veiculados = anuncios_veiculados + (
+            select count(distinct Identificador_id) from delta_fato
+            where Identificador_id not in (
+                select Identificador_id from fato_veiculacoes
+                where Identificador_id in (select Identificador_id from delta_fato)
+            )
+        )
+    """)
+
+    con.execute("""
+    update agg_propriedades set
+        Veiculações = agg_propriedades.Veiculações + delta.Veiculações,
+        Prevalência = agg_propriedades.Anúncios
+            * (agg_propriedades.Veiculações + delta.Veiculações)
+    from (
+        select
+            propriedade,
+            valor,
+            count(*) as Veiculações
+        from
+            delta_novos
+        join
+            indice_propriedades using(Identificador_id)
+        join
+            dim_valores using(propriedade, value_id)
+        where
+            novo_par
+        group by
+            propriedade,
+            valor
+    ) as delta
+    where
+        agg_propriedades.propriedade = delta.propriedade
+        and agg_propriedades.valor = delta.valor
+    """)
+
+    con.execute("""
+    create or replace temp table delta_edicoes as
+    select
+        Ano as ano,
+        ano_edicao,
+        anuncios,
+        pagina_primeiro_anuncio,
+        pagina_ultimo_anuncio
+    from (
+        select
+            edicao_id,
+            count(*) as anuncios,
+            min(Página) as pagina_primeiro_anuncio,
+            max(Página) as pagina_ultimo_anuncio
+        from delta_fato
+        group by
+            edicao_id
+    )
+    join
+        dim_edicoes using(edicao_id)
+    order by
+        edicao_id
+    """)
+    con.execute("""
+    update agg_edicoes set
+        anuncios = agg_edicoes.anuncios + delta.anuncios,
+        pagina_primeiro_anuncio = least(
+            agg_edicoes.pagina_primeiro_anuncio, delta.pagina_primeiro_anuncio
+        ),
+        pagina_ultimo_anuncio = greatest(
+            agg_edicoes.pagina_ultimo_anuncio, delta.pagina_ultimo_anuncio
+        )
+    from
+        delta_edicoes as delta
+    where
+        agg_edicoes.ano_edicao = delta.ano_edicao
+    """)
+    con.execute("""
+    insert into agg_edicoes
+    select * from delta_edicoes
+    where ano_edicao not in (select ano_edicao from agg_edicoes)
+    """)
+
+    con.execute("""
+    create or replace temp table delta_paginas as
+    select
+        Ano,
+        Página,
+        count(*) as Veiculações
+    from delta_fato
+    group by
+        Ano,
+        Página
+    order by
+        Ano,
+        Página
+    """)
+    con.execute("""
+    update agg_paginas set
+        Veiculações = agg_paginas.Veiculações + delta.Veiculações
+    from
+        delta_paginas as delta
+    where
+        agg_paginas.Ano = delta.Ano and agg_paginas.Página = delta.Página
+    """)
+    con.execute("""
+    insert into agg_paginas
+    select * from delta_paginas
+    where (Ano, Página) not in (select (Ano, Página) from agg_paginas)
+    """)
+
+    con.execute("insert into fato_veiculacoes by name select * from delta_fato")
+    for table in ["delta_fato", "delta_novos", "delta_edicoes", "delta_paginas"]:
+        con.execute(f"drop table {table}")
+
+
+def same_rows(
+    con: duckdb.DuckDBPyConnection, rows: pl.DataFrame, table: str = "veiculacoes"
+) -> bool:
+    """Whether rows and table hold the same multiset of rows, by count and hash sum."""
+    columns = ", ".join(f'"{col}"' for col in rows.columns)
+    fingerprint_sql = "select count(*), sum(hash({}))::hugeint from {}"
+    con.register("linhas_carregadas", rows)
+    same = (
+        con.execute(fingerprint_sql.format(columns, "linhas_carregadas")).fetchone()
+        == con.execute(fingerprint_sql.format(columns, table)).fetchone()
+    )
+    con.unregister("linhas_carregadas")
+    return same
+
+
+def load_new_veiculacoes(
+    con: duckdb.DuckDBPyConnection,
+    rows: pl.DataFrame,
+    sqlite_path: Path,
+    hashes: dict[str, str],
+) -> pl.DataFrame | None:
+    """Applies the veiculações of rows past the watermark to gold, in one transaction,
+    and returns them.
+
+    Returns None, without writing, when gold is stale for any other reason."""
+    duckdb_manifest = read_duckdb_manifest(con)
+    sqlite_manifest = read_sqlite_manifest(sqlite_path)
+    loaded = duckdb_manifest.get("veiculacoes")
+    previous = {
+        table.name: loaded if table.name == "veiculacoes" else hashes[table.name]
+        for table in gold_tables
+    }
+    up_to_date = (
+        all(duckdb_manifest.get(name) == h for name, h in previous.items())
+        and all(sqlite_manifest.get(name) == h for name, h in previous.items())
+        and duckdb_manifest.get("agregados") == aggregates_hash(previous)
+    )
+    if not up_to_date:
+        return None
+
+    watermark = con.execute("select * from pipeline_watermark").fetchone()
+    is_new = (
+        after_watermark(watermark).fill_null(False)
+        if watermark is not None
+        else pl.lit(True)
+    )
+    if not same_rows(con, rows.filter(~is_new)):
+        return None
+    new = rows.filter(is_new)
+
+    con.register("novas_veiculacoes", new)
+    con.begin()
+    if new.height:
+        apply_veiculacoes_delta(con)
+        build_watermark(con, "novas_veiculacoes")
+    con.executemany(
+        "insert or replace into pipeline_manifest values (?, ?)",
+        [[name, hashes[name]] for name in ["veiculacoes", "agregados"]],
+    )
+    con.commit()
+    con.unregister("novas_veiculacoes")
+    return new
+
+
+def append_veiculacoes(
+    bronze_dir: Path = bronze_dir,
+    silver_dir: Path = silver_dir,
+    gold_dir: Path = gold_dir,
+) -> int | None:
+    """Loads only the veiculações past the watermark into an up-to-date gold layer.
+
+    The rows up to the watermark must match the loaded ones, so a row catalogued late
+    below the watermark, or a corrected row, sends the load to the full pipeline.
+    DuckDB is written in place, unless the dashboard holds the file open, and the
+    silver table is rewritten from the same rows. Returns the number of new rows, or
+    None when gold is stale for any other reason and the full pipeline must run
+    instead."""
+    duckdb_path = gold_dir / f"{db_name}.duckdb"
+    sqlite_path = gold_dir / f"{db_name}.db"
+    if not duckdb_path.exists() or not sqlite_path.exists():
+        return None
+
+    hashes = table_hashes(bronze_dir)
+    source = bronze_sources["ad_insertions"]
+    rows = build_veiculacoes(source.read(bronze_dir / source.file_name))
+    try:
+        con = duckdb.connect(str(duckdb_path))
+    except duckdb.IOException as e:
+        if "lock" not in str(e):
+            raise
+        with staged_database(duckdb_path) as staged_path:
+            with duckdb.connect(str(staged_path)) as con:
+                new = load_new_veiculacoes(con, rows, sqlite_path, hashes)
+            if new is None:
+                staged_path.unlink()
+    else:
+        with con:
+            new = load_new_veiculacoes(con, rows, sqlite_path, hashes)
+    if new is None:
+        return None
+
+    if new.height:
+        new.write_database(
+            table_name="veiculacoes",
+            connection=f"sqlite:///{sqlite_path.resolve()}",
+            if_table_exists="append",
+            engine="adbc",
+        )
+    with closing(sqlite3.connect(sqlite_path)) as sqlite_con, sqlite_con:
+        sqlite_con.execute(
+            "insert or replace into pipeline_manifest values (?, ?)",
+            ("veiculacoes", hashes["veiculacoes"]),
+        )
+    silver_dir.mkdir(parents=True, exist_ok=True)
+    write_silver_table(
+        silver_path(silver_dir, "veiculacoes"), rows, hashes["veiculacoes"]
+    )
+
+    snapshot_path = gold_dir / f"{db_name}.arrow"
+    if not is_snapshot_fresh(duckdb_path, snapshot_path, queries):
+        write_snapshot(duckdb_path, snapshot_path, queries)
+    return new.height
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Constrói as tabelas silver e gold a partir dos CSVs bronze."
+    )
+    parser.add_argument("--bronze-dir", type=Path, default=bronze_dir)
+    parser.add_argument("--silver-dir", type=Path, default=silver_dir)
+    parser.add_argument("--gold-dir", type=Path, default=gold_dir)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--force", action="store_true", help="reconstrói todas as tabelas"
+    )
+    mode.add_argument(
+        "--append",
+        action="store_true",
+        help="carrega apenas as veiculações novas, após a marca d'água",
+    )
+    args = parser.parse_args()
+
+    appended = None
+    if args.append:
+        appended = append_veiculacoes(args.bronze_dir, args.silver_dir, args.gold_dir)
+        if appended is None:
+            print("A camada gold não está atualizada; executando o pipeline completo.")
+    if appended is not None:
+        print(f"Veiculações novas carregadas: {appended}")
+    else:
+        rebuilt = run_pipeline(
+            args.bronze_dir, args.silver_dir, args.gold_dir, args.force
+        )
+        print(f"Tabelas reconstruídas: {', '.join(rebuilt) if rebuilt else 'nenhuma'}")
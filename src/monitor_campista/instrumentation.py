@@ -0,0 +1,104 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger("monitor_campista")
+
+
+@dataclass(frozen=True)
+class Event:
+    """One timed query, filter or chart of a run.
+
+    cache is "hit" or "miss" for cache lookups and "-" for steps without a cache.
+    size_bytes is the estimated in-memory size of a result frame, or the Arrow IPC
+    size of the data embedded in a chart."""
+
+    kind: str
+    name: str
+    wall_ms: float
+    cache: str
+    rows: int
+    size_bytes: int
+
+
+def configure_json_logs(level: int = logging.INFO) -> None:
+    """Writes one JSON object per line to stderr for every recorded event."""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+
+
+def empty_totals() -> dict:
+    return {
+        "calls": 0,
+        "wall_ms": 0.0,
+        "hits": 0,
+        "misses": 0,
+        "rows": 0,
+        "size_bytes": 0,
+    }
+
+
+def merge_totals(totals: dict[str, dict], other: dict[str, dict]) -> dict[str, dict]:
+    merged = {kind: dict(values) for kind, values in totals.items()}
+    for kind, values in other.items():
+        target = merged.setdefault(kind, empty_totals())
+        for key, value in values.items():
+            target[key] = target.get(key, 0) + value
+    return merged
+
+
+class Recorder:
+    """Collects the query and chart events of one script run, from any thread."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events: list[Event] = []
+        self._lock = threading.Lock()
+
+    def record(self, event: Event) -> None:
+        with self._lock:
+            self.events.append(event)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(asdict(event), ensure_ascii=False))
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def totals(self) -> dict[str, dict]:
+        totals: dict[str, dict] = {}
+        with self._lock:
+            events = list(self.events)
+        for event in events:
+            values = totals.setdefault(event.kind, empty_totals())
+            values["calls"] += 1
+            values["wall_ms"] += event.wall_ms
+            if event.cache == "hit":
+                values["hits"] += 1
+            elif event.cache == "miss":
+                values["misses"] += 1
+            values["rows"] += event.rows
+            values["size_bytes"] += event.size_bytes
+        return totals
+
+    def finish(self, section: str) -> dict[str, dict]:
+        """Logs a summary of the run and returns its totals by event kind."""
+        totals = self.totals()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                json.dumps(
+                    {
+                        "kind": "rerun",
+                        "section": section,
+                        "wall_ms": self.elapsed_ms(),
+                        "totals": totals,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return totals
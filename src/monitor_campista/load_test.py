@@ -0,0 +1,235 @@
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from itertools import cycle, islice
+from pathlib import Path
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import WebSocketClientConnection, websocket_connect
+
+from benchmark import summarize
+from queries import section_queries
+
+dashboard_path = Path(__file__).with_name("dashboard.py")
+
+
+def rss_kib(pid: int) -> int:
+    """Resident set size of a process, read from /proc (0 where it is unavailable)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler(threading.Thread):
+    """Tracks the peak RSS of the server while a concurrency level runs."""
+
+    def __init__(self, pid: int, interval: float = 0.02):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kib = rss_kib(pid)
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.peak_kib = max(self.peak_kib, rss_kib(self.pid))
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak_kib
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, timeout: float = 60) -> subprocess.Popen:
+    """Starts the dashboard headless on localhost and waits for its health check."""
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "streamlit",
+            "run",
+            str(dashboard_path),
+            "--server.headless=true",
+            "--server.address=127.0.0.1",
+            f"--server.port={port}",
+            "--browser.gatherUsageStats=false",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health")
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("o servidor do Streamlit não respondeu")
+
+
+class Session:
+    """A browser-less client speaking Streamlit's websocket protocol."""
+
+    def __init__(self, ws: WebSocketClientConnection):
+        self.ws = ws
+        self.widget_id = None
+        self.options: list[str] = []
+
+    @classmethod
+    async def open(cls, port: int) -> "Session":
+        ws = await websocket_connect(
+            f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"]
+        )
+        session = cls(ws)
+        await session.rerun()
+        return session
+
+    async def rerun(self, section: str | None = None) -> None:
+        """Requests a script run, selecting a section, and waits for it to finish."""
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()
+        if section is not None:
+            state = WidgetState(id=self.widget_id)
+            state.int_array_value.data.append(self.options.index(section))
+            msg.rerun_script.widget_states.widgets.append(state)
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+
+        while True:
+            payload = await self.ws.read_message()
+            if payload is None:
+                raise RuntimeError("o servidor fechou a conexão")
+            fwd = ForwardMsg()
+            fwd.ParseFromString(payload)
+            kind = fwd.WhichOneof("type")
+            if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+                element = fwd.delta.new_element
+                if element.WhichOneof("type") == "exception":
+                    raise RuntimeError(
+                        f"falha ao renderizar a seção {section}: "
+                        f"{element.exception.message}"
+                    )
+                if element.WhichOneof("type") == "button_group":
+                    self.widget_id = element.button_group.id
+                    self.options = [o.content for o in element.button_group.options]
+            elif kind == "script_finished":
+                return
+
+    def close(self) -> None:
+        self.ws.close()
+
+
+async def run_session(
+    session: Session, sections: list[str], reruns: int, offset: int = 0
+) -> list[float]:
+    """Switches a session through the sections, timing each rerun in milliseconds."""
+    timings = []
+    for section in islice(cycle(sections), offset, offset + reruns):
+        start = time.perf_counter()
+        await session.rerun(section)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run_level(
+    port: int, pid: int, sessions: int, reruns: int, sections: list[str]
+) -> dict:
+    rss_before = rss_kib(pid)
+    sampler = RssSampler(pid)
+    sampler.start()
+
+    opened = await asyncio.gather(*(Session.open(port) for _ in range(sessions)))
+    rss_open = rss_kib(pid)
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            run_session(session, sections, reruns, offset=i)
+            for i, session in enumerate(opened)
+        )
+    )
+    wall = time.perf_counter() - start
+    for session in opened:
+        session.close()
+
+    rss_peak = sampler.stop()
+    timings = [t for session_timings in results for t in session_timings]
+    return {
+        "sessions": sessions,
+        **summarize(timings),
+        "reruns_per_s": len(timings) / wall,
+        "rss_before_mib": rss_before / 1024,
+        "rss_per_session_mib": (rss_open - rss_before) / 1024 / sessions,
+        "rss_peak_mib": rss_peak / 1024,
+    }
+
+
+async def run_load_test(
+    levels: list[int], reruns: int, sections: list[str]
+) -> list[dict]:
+    port = free_port()
+    server = start_server(port)
+    try:
+        warmup = await Session.open(port)
+        await run_session(warmup, sections, len(sections))
+        warmup.close()
+        return [await run_level(port, server.pid, n, reruns, sections) for n in levels]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_report(levels: list[dict]) -> None:
+    print(
+        f"{'sessões':>7}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  "
+        f"{'reruns/s':>8}  {'RSS/sessão MiB':>14}  {'pico RSS MiB':>12}"
+    )
+    for level in levels:
+        print(
+            f"{level['sessions']:>7}  {level['p50_ms']:>8.1f}  {level['p95_ms']:>8.1f}  "
+            f"{level['p99_ms']:>8.1f}  {level['reruns_per_s']:>8.1f}  "
+            f"{level['rss_per_session_mib']:>14.2f}  {level['rss_peak_mib']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Simula sessões simultâneas do dashboard e mede a escalabilidade."
+    )
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument(
+        "--reruns", type=int, default=10, help="reruns por sessão em cada nível"
+    )
+    parser.add_argument(
+        "--sections",
+        nargs="+",
+        choices=list(section_queries),
+        default=list(section_queries),
+    )
+    parser.add_argument("--report", type=Path, help="grava o relatório em JSON")
+    args = parser.parse_args()
+
+    levels = asyncio.run(run_load_test(args.sessions, args.reruns, args.sections))
+    print_report(levels)
+    if args.report:
+        args.report.write_text(json.dumps(levels, indent=2, ensure_ascii=False))
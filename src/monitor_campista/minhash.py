@@ -0,0 +1,125 @@
+import numpy as np
+import polars as pl
+
+n_hashes = 120
+lsh_bands = 40
+hash_block = 8
+chunk_pairs = 100_000
+
+
+def minhash_signatures(
+    tokens: pl.DataFrame, n_hashes: int = n_hashes, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    """Ad ids and, for each, the minimum of n_hashes random permutations of its token hashes.
+
+    Two signatures agree at a position with probability equal to the Jaccard similarity
+    of the two token sets. Each permutation is x -> a·x + b mod 2^64 with odd a, followed
+    by a bijective xorshift-multiply mixer that removes the bias of linear permutations
+    towards higher similarities. Only the high 32 bits of the minimum are kept."""
+    tokens = tokens.sort("Identificador_id")
+    ids, starts = np.unique(tokens["Identificador_id"].to_numpy(), return_index=True)
+    x = tokens["token"].hash(seed).to_numpy()[:, None]
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2**64, n_hashes, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**64, n_hashes, dtype=np.uint64)
+
+    signatures = np.empty((len(ids), n_hashes), dtype=np.uint32)
+    for lo in range(0, n_hashes, hash_block):
+        hi = lo + hash_block
+        permuted = x * a[lo:hi] + b[lo:hi]
+        permuted ^= permuted >> np.uint64(31)
+        permuted *= np.uint64(0x94D049BB133111EB)
+        permuted ^= permuted >> np.uint64(29)
+        signatures[:, lo:hi] = np.minimum.reduceat(
+            permuted, starts, axis=0
+        ) >> np.uint64(32)
+    return ids, signatures
+
+
+def lsh_candidates(
+    signatures: np.ndarray, bands: int = lsh_bands
+) -> tuple[np.ndarray, np.ndarray]:
+    """Pairs of rows whose signatures agree on every position of at least one band.
+
+    Only ads sharing a band bucket are compared, instead of every pair of ads."""
+    rows = signatures.shape[1] // bands
+    df = pl.DataFrame(signatures).with_row_index("row")
+    hashes = df.columns[1:]
+    buckets = pl.concat(
+        df.select(
+            "row",
+            pl.lit(band).alias("band"),
+            pl.concat_list(hashes[band * rows : (band + 1) * rows])
+            .hash()
+            .alias("bucket"),
+        )
+        for band in range(bands)
+    )
+    pairs = (
+        buckets.join(buckets, on=["band", "bucket"], suffix="_b")
+        .filter(pl.col("row") < pl.col("row_b"))
+        .select("row", "row_b")
+        .unique()
+    )
+    return pairs["row"].to_numpy(), pairs["row_b"].to_numpy()
+
+
+def estimated_similarity(
+    signatures: np.ndarray, a: np.ndarray, b: np.ndarray
+) -> np.ndarray:
+    """Share of agreeing signature positions of each (a, b) pair of rows."""
+    similarity = np.empty(len(a))
+    for start in range(0, len(a), chunk_pairs):
+        stop = start + chunk_pairs
+        similarity[start:stop] = (
+            signatures[a[start:stop]] == signatures[b[start:stop]]
+        ).mean(axis=1)
+    return similarity
+
+
+def connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Labels each of n nodes with the smallest node of its component."""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        hooked = labels.copy()
+        for nodes in [a, b, labels[a], labels[b]]:
+            np.minimum.at(hooked, nodes, low)
+        hooked = hooked[hooked]
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def representative_clusters(
+    signatures: np.ndarray, a: np.ndarray, b: np.ndarray, threshold: float
+) -> np.ndarray:
+    """Labels each row with the representative of its group, given the similar pairs.
+
+    The smallest row of each connected component is its representative, and a row only
+    joins that group when it is itself similar to the representative, so a chain of
+    pairwise similar rows cannot merge unrelated ones. The rows left out are grouped
+    again among themselves."""
+    labels = np.arange(len(signatures))
+    pending = np.ones(len(signatures), dtype=bool)
+    while len(a):
+        components = connected_components(len(signatures), a, b)
+        rows = np.flatnonzero(pending)
+        joins = estimated_similarity(signatures, rows, components[rows]) >= threshold
+        labels[rows[joins]] = components[rows[joins]]
+        pending[rows[joins]] = False
+        remaining = pending[a] & pending[b]
+        a, b = a[remaining], b[remaining]
+    return labels
+
+
+def variant_clusters(tokens: pl.DataFrame, threshold: float) -> pl.DataFrame:
+    """Groups ads whose token sets have an estimated Jaccard similarity of at least
+    threshold with the representative ad of the group."""
+    ids, signatures = minhash_signatures(tokens)
+    a, b = lsh_candidates(signatures)
+    similar = estimated_similarity(signatures, a, b) >= threshold
+    labels = representative_clusters(signatures, a[similar], b[similar], threshold)
+    return pl.DataFrame(
+        {"Identificador_id": ids, "grupo_id": ids[labels]}
+    ).with_columns(pl.len().over("grupo_id").alias("variantes"))
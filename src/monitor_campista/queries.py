@@ -0,0 +1,265 @@
+# Categories of each ad for the charts that count ads by category, which the bitmap
+# index filters by ad before counting.
+ad_categories = {
+    "authorizations": """
+        with autorizacoes as (
+        select
+            Identificador,
+            case
+                when autorizacoes = 'Ausente' then 'Ausente'
+                when autorizacoes = 'Governo Imperial' then 'Governo Imperial'
+                when autorizacoes = 'Pharmacopéa official da França' then 'Pharmacopéa official da França'
+                when autorizacoes = 'Academia de Medicina de Paris' then 'Academia de Medicina de Paris'
+                else 'Exma. Junta Central de Hygiene'
+            end as Autoridade,
+            case
+                when autorizacoes = 'Ausente' then 'Ausente'
+                else 'Presente'
+            end as Autorização
+        from
+            autorizacoes
+        )
+        select distinct
+            Identificador_id,
+            Autoridade,
+            Autorização
+        from anuncios
+        join
+            dim_anuncios using(Identificador)
+        left join
+            autorizacoes using(Identificador)
+    """,
+    "typographic_variations": """
+        select
+            Identificador_id,
+            "Quantidade de variações tipográficas (aprox.)" as 'Quantidade de variações tipográficas'
+        from
+            anuncios
+        join
+            dim_anuncios using(Identificador)
+    """,
+    "image_presence": """
+        select distinct
+            Identificador_id,
+            case
+                when tipificacao_da_imagem_aprox = 'Ausente' then 'Ausente'
+                else 'Presente'
+            end as 'Presença de imagem'
+        from
+            tipificacao_da_imagem_aprox
+        join
+            dim_anuncios using(Identificador)
+    """,
+}
+
+queries = {
+    "indicators": """select * from agg_indicadores""",
+    "properties": """
+        select
+            *
+        from
+            agg_propriedades
+        order by
+            propriedade,
+            valor
+    """,
+    "ads": """
+        with molestias as (
+            select
+                Identificador_id,
+                valor
+            from
+                indice_propriedades
+            join
+                dim_valores using(propriedade, value_id)
+            where
+                propriedade = 'doenca_mencionada'
+        ),
+        veiculacoes_por_anuncio as (
+            select
+                Identificador_id,
+                count(distinct edicao_anuncio_id) as Veiculações,
+                group_concat(distinct Orientação) as 'Orientações',
+                group_concat(distinct valor) as Moléstias,
+                group_concat(Orientação) as 'Orientações Detalhadas',
+            from
+                fato_veiculacoes
+            left join
+                molestias using(Identificador_id)
+            group by
+                Identificador_id
+        )
+        select
+            image_url as 'Anúncio',
+            "Produto ofertado (título completo)",
+            Veiculações,
+            Orientações,
+            Moléstias,
+            "Orientações Detalhadas",
+            Identificador,
+        from
+            veiculacoes_por_anuncio
+        join
+            dim_anuncios using(Identificador_id)
+        left join
+            anuncios using(Identificador)
+        order by
+            Veiculações desc
+    """,
+    "ads_by_edition": """
+        select
+            *
+        from agg_edicoes
+        order by
+            ano_edicao
+    """,
+    "placements_per_page": """
+        select
+            Ano,
+            Página,
+            Veiculações
+        from
+            agg_paginas
+        order by
+            Ano,
+            Página
+    """,
+    "pages_per_edition": """
+        select
+            pagina_ultimo_anuncio as 'Total de Páginas',
+            count(*) as Edições
+        from
+            agg_edicoes
+        group by
+            pagina_ultimo_anuncio
+    """,
+    "ailments_per_ad": """
+        select
+            valor as Moléstia,
+            count(distinct Identificador_id) as Anúncios,
+            count(distinct edicao_id) as Veiculações,
+            count(distinct Identificador_id) * count(distinct edicao_id) as Prevalência
+        from
+            indice_propriedades
+        join
+            dim_valores using(propriedade, value_id)
+        left join
+            fato_veiculacoes using(Identificador_id)
+        where
+            propriedade = 'doenca_mencionada'
+        group by
+            valor
+        order by
+            Anúncios desc
+    """,
+    "ailments_count_per_ad": """
+        with molestias as (
+            select
+                Identificador_id,
+                value_id
+            from
+                indice_propriedades
+            join
+                dim_valores using(propriedade, value_id)
+            where
+                propriedade = 'doenca_mencionada'
+                and valor != 'Ausente'
+        )
+        select
+            Identificador_id as anuncio,
+            count(distinct value_id) as molestias
+        from
+            anuncios
+        join
+            dim_anuncios using(Identificador)
+        left join
+            molestias using(Identificador_id)
+        group by
+            Identificador_id
+    """,
+    "authorizations": f"""
+        select
+            Autoridade,
+            Autorização,
+            count(distinct Identificador_id) as Anúncios,
+        from
+            ({ad_categories["authorizations"]})
+        group by
+            Autorização, Autoridade
+    """,
+    "typographic_variations": f"""
+        select
+            "Quantidade de variações tipográficas",
+            count(distinct Identificador_id) as Anúncios,
+        from
+            ({ad_categories["typographic_variations"]})
+        group by
+            "Quantidade de variações tipográficas"
+    """,
+    "image_presence": f"""
+        select
+            "Presença de imagem",
+            count(distinct Identificador_id) as Anúncios
+        from
+            ({ad_categories["image_presence"]})
+        group by
+            "Presença de imagem"
+    """,
+    "variant_groups": """
+        select
+            anuncios.Identificador,
+            grupos.Identificador as Grupo
+        from
+            grupos_variantes
+        join
+            dim_anuncios as anuncios using(Identificador_id)
+        join
+            dim_anuncios as grupos on grupos.Identificador_id = grupo_id
+    """,
+    "cooccurrence_inputs": """
+        with veiculacoes_anuncio as (
+        select
+            Identificador_id,
+            count(*) as Veiculações
+        from
+            fato_veiculacoes
+        group by
+            Identificador_id
+        )
+        select
+            propriedade,
+            count(*) as Pares,
+            bit_xor(hash(Identificador, valor, Veiculações)) as Assinatura
+        from
+            indice_propriedades
+        join
+            dim_valores using(value_id, propriedade)
+        join
+            dim_anuncios using(Identificador_id)
+        left join
+            veiculacoes_anuncio using(Identificador_id)
+        group by
+            propriedade
+    """,
+}
+
+section_queries = {
+    "Geral": [
+        "indicators",
+        "ads",
+        "ads_by_edition",
+        "placements_per_page",
+        "pages_per_edition",
+        "variant_groups",
+    ],
+    "Discurso": [
+        "indicators",
+        "properties",
+        "ailments_count_per_ad",
+        "ailments_per_ad",
+        "authorizations",
+    ],
+    "Gráfico": ["indicators", "properties", "typographic_variations", "image_presence"],
+    "Extras": ["properties", "cooccurrence_inputs"],
+    "Links": [],
+}
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+from typing import Callable
+
+import polars as pl
+
+
+def db_fingerprint(db_path: Path) -> tuple[int, int]:
+    """Identifies a version of the database file by its modification time and size."""
+    stat = Path(db_path).stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def instance_lru_cache(maxsize: int = 64):
+    """Like functools.lru_cache on a method, but with one cache stored on each instance.
+
+    lru_cache on a method is a single class-level cache holding every instance it has seen,
+    so an index dropped by st.cache_resource would stay alive with all its arrays."""
+
+    def decorator(method):
+        attribute = f"_{method.__name__}_cache"
+
+        @wraps(method)
+        def wrapper(self, *args):
+            try:
+                entries, lock = self.__dict__[attribute]
+            except KeyError:
+                entries, lock = self.__dict__.setdefault(
+                    attribute, (OrderedDict(), threading.Lock())
+                )
+            with lock:
+                if args in entries:
+                    entries.move_to_end(args)
+                    return entries[args]
+
+            result = method(self, *args)
+
+            with lock:
+                entries[args] = result
+                entries.move_to_end(args)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class QueryCache:
+    """Bounded LRU cache of query results, invalidated whenever the database file changes."""
+
+    def __init__(self, db_path: Path, maxsize: int = 256):
+        self.db_path = Path(db_path)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._fingerprint: tuple[int, int] | None = None
+        self._entries: OrderedDict[str, pl.DataFrame] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sql: str, run: Callable[[str], pl.DataFrame]) -> pl.DataFrame:
+        return self.lookup(sql, run)[0]
+
+    def lookup(
+        self, sql: str, run: Callable[[str], pl.DataFrame]
+    ) -> tuple[pl.DataFrame, bool]:
+        """Like get, but also reports whether the result came from the cache.
+
+        Callers get their own clone: converting one shared polars frame from several
+        sessions at once (as st.dataframe does) can deadlock."""
+        fingerprint = db_fingerprint(self.db_path)
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                self._entries.clear()
+                self._fingerprint = fingerprint
+            if sql in self._entries:
+                self._entries.move_to_end(sql)
+                self.hits += 1
+                return self._entries[sql].clone(), True
+
+        df = run(sql)
+
+        with self._lock:
+            self.misses += 1
+            if fingerprint == self._fingerprint:
+                self._entries[sql] = df
+                self._entries.move_to_end(sql)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return df.clone(), False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fingerprint = None
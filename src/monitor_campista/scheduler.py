@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import polars as pl
+
+
+class QueryScheduler:
+    """Runs a declared set of named queries concurrently on a shared thread pool."""
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="query"
+        )
+
+    def run(
+        self, queries: dict[str, str], run_query: Callable[[str], pl.DataFrame]
+    ) -> dict[str, pl.DataFrame]:
+        futures = {
+            name: self._executor.submit(run_query, sql) for name, sql in queries.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,94 @@
+import duckdb
+import numpy as np
+import polars as pl
+
+from data_processing import search_terms
+from query_cache import instance_lru_cache
+
+ads_sql = """
+    select Identificador_id, Identificador from dim_anuncios order by Identificador_id
+"""
+postings_sql = """
+    select
+        termo,
+        Identificador_id,
+        peso
+    from
+        indice_busca
+    order by
+        termo,
+        Identificador_id
+"""
+
+
+class SearchIndex:
+    """The ETL inverted index held as a sorted vocabulary with CSR postings.
+
+    Words sharing a prefix are adjacent in the vocabulary, so each typed word resolves
+    to one slice of postings found by two binary searches, with no scan of the ads.
+    """
+
+    def __init__(self, ads: pl.DataFrame, postings: pl.DataFrame):
+        # Ids are 1-based row numbers, so position 0 of every ad array stays unused.
+        self.n_ads = ads.height + 1
+        self.identifiers = np.array([None, *ads["Identificador"]], dtype=object)
+
+        terms = postings.group_by("termo", maintain_order=True).len()
+        doc_freq = terms["len"].cast(pl.Int64).to_numpy()
+        n_docs = max(postings["Identificador_id"].n_unique(), 1)
+        self.terms = terms["termo"].to_numpy().astype(object)
+        self.term_lengths = terms["termo"].str.len_chars().to_numpy()
+        self.offsets = np.concatenate([[0], np.cumsum(doc_freq)])
+        self.ads = postings["Identificador_id"].to_numpy()
+        idf = np.log(1 + n_docs / doc_freq)
+        self.weights = postings["peso"].to_numpy() * np.repeat(idf, doc_freq)
+
+    @classmethod
+    def from_connection(cls, con: duckdb.DuckDBPyConnection) -> "SearchIndex":
+        return cls(con.sql(ads_sql).pl(), con.sql(postings_sql).pl())
+
+    def prefix_range(self, prefix: str) -> tuple[int, int]:
+        lo, hi = np.searchsorted(self.terms, [prefix, prefix + "\U0010ffff"])
+        return int(lo), int(hi)
+
+    def word_scores(self, word: str) -> np.ndarray:
+        """Best score of each ad among the words starting with word.
+
+        A completion scores by the share of it already typed, so exact words rank first."""
+        lo, hi = self.prefix_range(word)
+        start, stop = self.offsets[lo], self.offsets[hi]
+        completeness = len(word) / self.term_lengths[lo:hi]
+        scores = np.zeros(self.n_ads)
+        np.maximum.at(
+            scores,
+            self.ads[start:stop],
+            self.weights[start:stop]
+            * np.repeat(completeness, np.diff(self.offsets[lo : hi + 1])),
+        )
+        return scores
+
+    @instance_lru_cache(maxsize=256)
+    def search(self, text: str) -> pl.DataFrame:
+        """Ads matching every word of text, most relevant first."""
+        words = (
+            pl.select(search_terms(pl.lit(text, dtype=pl.Utf8)))
+            .to_series()
+            .explode()
+            .drop_nulls()
+            .unique()
+            .to_list()
+        )
+        if not words:
+            return pl.DataFrame(
+                schema={"Identificador": pl.Utf8, "relevancia": pl.Float64}
+            )
+        scores = np.array([self.word_scores(word) for word in words])
+        ids = np.flatnonzero(scores.all(axis=0))
+        total = scores[:, ids].sum(axis=0)
+        order = np.argsort(-total, kind="stable")
+        return pl.DataFrame(
+            {
+                "Identificador": pl.Series(self.identifiers[ids[order]], dtype=pl.Utf8),
+                "relevancia": total[order],
+            }
+        )
@@ -0,0 +1,70 @@
+import hashlib
+from pathlib import Path
+
+import duckdb
+import polars as pl
+
+from query_cache import db_fingerprint
+
+
+def queries_hash(queries: dict[str, str]) -> str:
+    return hashlib.sha256(repr(sorted(queries.items())).encode()).hexdigest()
+
+
+def write_snapshot(db_path: Path, path: Path, queries: dict[str, str]) -> None:
+    """Stores every query result as one list[struct] column of a single-row IPC file."""
+    with duckdb.connect(str(db_path), read_only=True) as con:
+        frames = [
+            con.sql(sql).pl().select(pl.struct(pl.all()).implode().alias(name))
+            for name, sql in queries.items()
+        ]
+    mtime_ns, size = db_fingerprint(db_path)
+    header = pl.DataFrame(
+        {
+            "_db_mtime_ns": [mtime_ns],
+            "_db_size": [size],
+            "_queries_hash": [queries_hash(queries)],
+        }
+    )
+    tmp_path = path.with_suffix(".arrow.tmp")
+    pl.concat([header, *frames], how="horizontal").write_ipc(
+        tmp_path, compression="uncompressed"
+    )
+    tmp_path.replace(path)
+
+
+def is_snapshot_fresh(db_path: Path, path: Path, queries: dict[str, str]) -> bool:
+    if not path.exists():
+        return False
+    header = pl.read_ipc(
+        path, columns=["_db_mtime_ns", "_db_size", "_queries_hash"], memory_map=True
+    ).row(0)
+    return header == (*db_fingerprint(db_path), queries_hash(queries))
+
+
+class Snapshot:
+    """Memory-mapped query results, served only while the database file is unchanged."""
+
+    def __init__(self, path: Path, db_path: Path, queries: dict[str, str]):
+        self.db_path = Path(db_path)
+        self._fingerprint: tuple[int, int] | None = None
+        self._names: dict[str, str] = {}
+        self._snapshot: pl.DataFrame | None = None
+        if not Path(path).exists():
+            return
+
+        snapshot = pl.read_ipc(path, memory_map=True)
+        mtime_ns, size, snapshot_queries_hash = snapshot.select(
+            "_db_mtime_ns", "_db_size", "_queries_hash"
+        ).row(0)
+        if snapshot_queries_hash != queries_hash(queries):
+            return
+        self._fingerprint = (mtime_ns, size)
+        self._names = {sql: name for name, sql in queries.items()}
+        self._snapshot = snapshot
+
+    def get(self, sql: str) -> pl.DataFrame | None:
+        name = self._names.get(sql)
+        if name is None or db_fingerprint(self.db_path) != self._fingerprint:
+            return None
+        return self._snapshot[name][0].struct.unnest()
@@ -0,0 +1,222 @@
+import argparse
+import html
+import json
+import re
+import tomllib
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+from streamlit.testing.v1 import AppTest
+
+from chart_cache import to_arrow_bytes
+from data_processing import clean_text, content_hash, file_hash, gold_db_path
+from queries import queries, section_queries
+
+package_dir = Path(__file__).parent
+dashboard_path = package_dir / "dashboard.py"
+config_path = package_dir / ".streamlit" / "config.toml"
+site_dir = Path("site")
+
+vega_scripts = [
+    "https://cdn.jsdelivr.net/npm/vega@5",
+    "https://cdn.jsdelivr.net/npm/vega-lite@5",
+    "https://cdn.jsdelivr.net/npm/vega-embed@6",
+]
+
+
+def section_file(section: str) -> str:
+    return (
+        "index.html"
+        if section == next(iter(section_queries))
+        else f"{clean_text(section)}.html"
+    )
+
+
+def code_hash() -> str:
+    return content_hash(
+        [file_hash(path) for path in sorted(package_dir.glob("*.py"))],
+        file_hash(config_path),
+    )
+
+
+def section_hashes() -> dict[str, str]:
+    """Hashes each section's query results, so a section is only rebuilt when its data changes."""
+    with duckdb.connect(str(gold_db_path), read_only=True) as con:
+        results = {}
+        for name in {name for names in section_queries.values() for name in names}:
+            df = con.sql(queries[name]).pl()
+            results[name] = content_hash(to_arrow_bytes(df.sort(df.columns)))
+    version = code_hash()
+    return {
+        section: content_hash(version, [results[name] for name in names])
+        for section, names in section_queries.items()
+    }
+
+
+def markdown_to_html(body: str, allow_html: bool) -> str:
+    if not allow_html:
+        body = html.escape(body, quote=False)
+    body = re.sub(r"\[([^\]]+)\]\(([^)\s]+)\)", r'<a href="\2">\1</a>', body)
+    return body if allow_html else f"<p>{body}</p>"
+
+
+def format_cell(value, type_config: dict) -> str:
+    if value is None:
+        return ""
+    if type_config.get("type") == "image":
+        return f'<img src="{html.escape(str(value))}" loading="lazy" height="64">'
+    if type_config.get("format"):
+        return html.escape(type_config["format"] % value)
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return html.escape(str(value))
+
+
+def dataframe_to_html(proto) -> str:
+    table = pa.ipc.open_stream(proto.data).read_all()
+    column_config = json.loads(proto.columns) if proto.columns else {}
+    names = [name for name in table.column_names if not name.startswith("__index")]
+    header = "".join(f"<th>{html.escape(name)}</th>" for name in names)
+    rows = "".join(
+        "<tr>"
+        + "".join(
+            f"<td>{format_cell(row[name], column_config.get(name, {}).get('type_config', {}))}</td>"
+            for name in names
+        )
+        + "</tr>"
+        for row in table.select(names).to_pylist()
+    )
+    return f'<div class="dataframe"><table><thead><tr>{header}</tr></thead><tbody>{rows}</tbody></table></div>'
+
+
+def chart_to_spec(proto) -> dict:
+    spec = json.loads(proto.spec)
+    spec["datasets"] = {
+        dataset.name: pa.ipc.open_stream(dataset.data.data).read_all().to_pylist()
+        for dataset in proto.datasets
+    }
+    if proto.data.data:
+        spec["data"] = {
+            "values": pa.ipc.open_stream(proto.data.data).read_all().to_pylist()
+        }
+    if proto.use_container_width:
+        spec["width"] = "container"
+    return spec
+
+
+def render_node(node, specs: list[dict]) -> str:
+    node_type = getattr(node, "type", None)
+    if node_type == "markdown":
+        return markdown_to_html(node.proto.body, node.proto.allow_html)
+    if node_type == "arrow_data_frame":
+        return dataframe_to_html(node.proto)
+    if node_type == "arrow_vega_lite_chart":
+        specs.append(chart_to_spec(node.proto))
+        return f'<div class="chart" id="chart-{len(specs) - 1}"></div>'
+    children = "".join(
+        render_node(child, specs) for child in getattr(node, "children", {}).values()
+    )
+    if node_type == "flex_container" and children:
+        return f'<div class="columns">{children}</div>'
+    if node_type == "column":
+        return f"<div>{children}</div>"
+    return children
+
+
+def render_page(at: AppTest, section: str, theme: dict) -> str:
+    specs: list[dict] = []
+    body = render_node(at.main, specs)
+    heading = re.search(r"<h1[^>]*>(.*?)</h1>", body, re.S)
+    page_title = re.sub(r"<[^>]+>", "", heading.group(1)) if heading else section
+    nav = "".join(
+        f'<a href="{section_file(name)}"'
+        + (' class="active"' if name == section else "")
+        + f">{html.escape(name)}</a>"
+        for name in section_queries
+    )
+    embeds = "\n".join(
+        f'vegaEmbed("#chart-{i}", {json.dumps(spec, ensure_ascii=False)}, {{actions: false}});'
+        for i, spec in enumerate(specs)
+    ).replace("</", "<\\/")
+    font = theme.get("font", "serif")
+    scripts = "".join(f'<script src="{src}"></script>' for src in vega_scripts)
+    return f"""<!doctype html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(section)} · {html.escape(page_title)}</title>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family={font.replace(" ", "+")}&display=swap">
+{scripts}
+<style>
+body {{ font-family: "{font}", serif; background: {theme.get("backgroundColor", "#fff")}; color: {theme.get("textColor", "#000")}; max-width: 736px; margin: 0 auto; padding: 2rem 1rem; }}
+a {{ color: {theme.get("linkColor", "inherit")}; }}
+nav {{ display: flex; gap: 0.5rem; margin-bottom: 1.5rem; }}
+nav a {{ padding: 0.3rem 0.8rem; border: 1px solid {theme.get("borderColor", "#ccc")}; border-radius: 0.5rem; text-decoration: none; color: inherit; }}
+nav a.active {{ border-color: {theme.get("primaryColor", "#000")}; color: {theme.get("primaryColor", "#000")}; }}
+.columns {{ display: flex; gap: 1rem; }}
+.columns > div {{ flex: 1; }}
+.chart {{ width: 100%; margin: 1rem 0; }}
+.dataframe {{ max-height: 400px; overflow: auto; margin: 1rem 0; border: 1px solid {theme.get("borderColor", "#ccc")}; }}
+table {{ border-collapse: collapse; font-size: 0.85rem; width: 100%; }}
+th {{ position: sticky; top: 0; background: {theme.get("secondaryBackgroundColor", "#eee")}; }}
+th, td {{ padding: 0.25rem 0.5rem; text-align: left; vertical-align: top; }}
+</style>
+</head>
+<body>
+<nav>{nav}</nav>
+{body}
+<script>
+{embeds}
+</script>
+</body>
+</html>
+"""
+
+
+def export_site(site_dir: Path = site_dir, force: bool = False) -> list[str]:
+    """Renders every dashboard section to static HTML, skipping sections whose data is unchanged.
+
+    Returns the names of the exported sections."""
+    site_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = site_dir / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    hashes = section_hashes()
+    stale = [
+        section
+        for section, section_hash in hashes.items()
+        if force
+        or manifest.get(section) != section_hash
+        or not (site_dir / section_file(section)).exists()
+    ]
+    if not stale:
+        return []
+
+    with open(config_path, "rb") as f:
+        theme = tomllib.load(f)["theme"]
+
+    at = AppTest.from_file(str(dashboard_path), default_timeout=120)
+    at.run()
+    for section in stale:
+        at.get("button_group")[0].set_value([section]).run()
+        if at.exception:
+            raise RuntimeError(f"falha ao renderizar a seção {section}: {at.exception}")
+        (site_dir / section_file(section)).write_text(render_page(at, section, theme))
+        manifest[section] = hashes[section]
+        manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2))
+    return stale
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Exporta todas as seções do dashboard como HTML estático."
+    )
+    parser.add_argument("--site-dir", type=Path, default=site_dir)
+    parser.add_argument(
+        "--force", action="store_true", help="reexporta todas as seções"
+    )
+    args = parser.parse_args()
+
+    exported = export_site(args.site_dir, args.force)
+    print(f"Seções exportadas: {', '.join(exported) if exported else 'nenhuma'}")
@@ -0,0 +1,213 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from data_processing import bronze_dir, bronze_sources, multi_select_columns
+
+synthetic_dir = Path("data/synthetic/01_bronze")
+chunk_rows = 200_000
+link_alphabet = np.array(
+    list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_")
+)
+
+
+def read_raw(path: Path) -> pl.DataFrame:
+    return pl.read_csv(path, infer_schema_length=0)
+
+
+def multi_select_model(
+    values: pl.Series, scale: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Fits how many values an ad takes in a column and how often each value occurs.
+
+    The vocabulary grows with the square root of the scale (Heaps' law): the real values
+    keep their frequencies and the new ones extend the tail as a power law."""
+    lists = values.str.split(", ")
+    lengths = lists.list.len().fill_null(0).value_counts()
+    counts = lists.explode().drop_nulls().value_counts(sort=True)
+    vocab = counts[:, 0].to_list()
+    weights = counts["count"].cast(pl.Float64).to_numpy()
+
+    n_real = len(vocab)
+    n_total = max(n_real, round(n_real * scale**0.5))
+    ranks = np.arange(n_real + 1, n_total + 1)
+    vocab += [f"{vocab[(r - 1) % n_real]} {r // n_real + 1}" for r in ranks]
+    weights = np.concatenate([weights, weights[-1] * n_real / ranks])
+
+    return (
+        lengths[:, 0].to_numpy(),
+        (lengths["count"] / lengths["count"].sum()).to_numpy(),
+        np.array(vocab, dtype=object),
+        weights / weights.sum(),
+    )
+
+
+def sample_multi_select(rng: np.random.Generator, model, n: int) -> pl.Series:
+    length_values, length_p, vocab, p = model
+    lengths = rng.choice(length_values, size=n, p=length_p)
+    tokens = pl.DataFrame(
+        {
+            "row": np.repeat(np.arange(n), lengths),
+            "value": vocab[rng.choice(len(vocab), size=int(lengths.sum()), p=p)],
+        }
+    )
+    joined = tokens.group_by("row").agg(
+        pl.col("value").unique(maintain_order=True).str.join(", ")
+    )
+    return (
+        pl.DataFrame({"row": np.arange(n)})
+        .join(joined, on="row", how="left")
+        .sort("row")["value"]
+    )
+
+
+def drive_links(rng: np.random.Generator, n: int) -> pl.Series:
+    ids = link_alphabet[rng.integers(len(link_alphabet), size=(n, 33))]
+    return pl.Series(
+        ["https://drive.google.com/file/d/" + "".join(row) + "/view" for row in ids]
+    )
+
+
+def generate_ad_analysis(
+    real: pl.DataFrame, n_ads: int, path: Path, rng: np.random.Generator
+) -> list[str]:
+    """Writes n_ads synthetic analysis records and returns their identifiers."""
+    scale = n_ads / real.height
+    models = {col: multi_select_model(real[col], scale) for col in multi_select_columns}
+    base_ids = real["Identificador"].to_numpy()
+    identifiers = [f"{base_ids[i % real.height]}_s{i}" for i in range(n_ads)]
+    original_p = 1 - real["Original (primeira aparição)"].null_count() / real.height
+
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, n_ads, chunk_rows):
+            n = min(chunk_rows, n_ads - start)
+            rows = rng.integers(real.height, size=n)
+            columns = {}
+            for col in real.columns:
+                if col in models:
+                    columns[col] = sample_multi_select(rng, models[col], n)
+                else:
+                    columns[col] = real[col].gather(rows)
+            columns["Identificador"] = pl.Series(identifiers[start : start + n])
+            columns["ID"] = pl.Series(np.arange(start + 1, start + n + 1)).cast(pl.Utf8)
+            columns["Link"] = drive_links(rng, n)
+
+            # Points some ads at an earlier one as the first appearance of its layout.
+            earlier = (rng.random(n) * (start + np.arange(n))).astype(int)
+            columns["Original (primeira aparição)"] = pl.Series(
+                [
+                    f"{identifiers[e]} (https://www.notion.so/{identifiers[e]})"
+                    if has_original and start + i > 0
+                    else None
+                    for i, (e, has_original) in enumerate(
+                        zip(earlier, rng.random(n) < original_p)
+                    )
+                ],
+                dtype=pl.Utf8,
+            )
+            pl.DataFrame(columns).select(real.columns).write_csv(
+                f, include_header=start == 0
+            )
+    return identifiers
+
+
+def generate_ad_insertions(
+    real: pl.DataFrame,
+    identifiers: list[str],
+    n_rows: int,
+    path: Path,
+    rng: np.random.Generator,
+    max_years: int = 120,
+) -> None:
+    """Resamples real insertion rows over more ads and a longer run of the newspaper.
+
+    Each synthetic ad draws its popularity from the real insertions per ad, so a few ads
+    still account for most insertions. The timeline keeps the real number of rows per
+    year until max_years is reached, and grows denser after that."""
+    real = real.with_columns(pl.col("Ano").cast(pl.Int32, strict=False))
+    popularity = real["Anúncio"].drop_nulls().value_counts()["count"].to_numpy()
+    weights = rng.choice(popularity, size=len(identifiers)).astype(float)
+    weights /= weights.sum()
+    ids = np.array(identifiers, dtype=object)
+
+    years = real["Ano"].drop_nulls()
+    first_year = years.min()
+    n_years = min(
+        max_years,
+        max(years.n_unique(), round(years.n_unique() * n_rows / real.height)),
+    )
+
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, n_rows, chunk_rows):
+            n = min(chunk_rows, n_rows - start)
+            sample = real[rng.integers(real.height, size=n)]
+            ads = ids[rng.choice(len(ids), size=n, p=weights)]
+            year = first_year + rng.integers(n_years, size=n)
+            sample.with_columns(
+                pl.when(pl.col("Anúncio").is_not_null())
+                .then(pl.Series(ads, dtype=pl.Utf8))
+                .alias("Anúncio"),
+                pl.when(pl.col("Ano").is_not_null())
+                .then(pl.Series(year, dtype=pl.Int32))
+                .cast(pl.Utf8)
+                .alias("Ano"),
+            ).write_csv(f, include_header=start == 0)
+
+
+def generate_corpus(
+    out_dir: Path = synthetic_dir,
+    n_ads: int | None = None,
+    n_insertions: int | None = None,
+    scale: float = 10,
+    seed: int = 0,
+) -> tuple[int, int]:
+    """Writes synthetic bronze CSVs shaped like the real ones, scale times larger by default."""
+    rng = np.random.default_rng(seed)
+    analysis = bronze_sources["ad_analysis"]
+    insertions = bronze_sources["ad_insertions"]
+    real_analysis = read_raw(bronze_dir / analysis.file_name)
+    real_insertions = read_raw(bronze_dir / insertions.file_name)
+    n_ads = n_ads or round(real_analysis.height * scale)
+    n_insertions = n_insertions or round(real_insertions.height * scale)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    identifiers = generate_ad_analysis(
+        real_analysis, n_ads, out_dir / analysis.file_name, rng
+    )
+    generate_ad_insertions(
+        real_insertions,
+        identifiers,
+        n_insertions,
+        out_dir / insertions.file_name,
+        rng,
+    )
+    return n_ads, n_insertions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gera CSVs bronze sintéticos com o formato e a distribuição dos reais."
+    )
+    parser.add_argument("--out-dir", type=Path, default=synthetic_dir)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=10,
+        help="multiplicador do tamanho do corpus real",
+    )
+    parser.add_argument("--ads", type=int, help="número de fichas de análise")
+    parser.add_argument("--veiculacoes", type=int, help="número de veiculações")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n_ads, n_insertions = generate_corpus(
+        args.out_dir, args.ads, args.veiculacoes, args.scale, args.seed
+    )
+    print(
+        f"Gerados {n_ads} anúncios e {n_insertions} veiculações em {args.out_dir} "
+        f"em {time.perf_counter() - start:.1f}s"
+    )
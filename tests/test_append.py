@@ -0,0 +1,76 @@
+import csv
+import shutil
+from pathlib import Path
+
+import duckdb
+import polars as pl
+import pytest
+
+from data_processing import append_veiculacoes, db_name, run_pipeline
+
+bronze_dir = Path(__file__).parents[1] / "data" / "01_bronze"
+insertions_file = "sheets_ficha_registro_veiculacoes.csv"
+
+
+def write_insertions(path: Path, keep) -> None:
+    with (bronze_dir / insertions_file).open(newline="") as f:
+        header, *rows = csv.reader(f)
+    with path.open("w", newline="") as f:
+        csv.writer(f).writerows([header, *(row for row in rows if keep(row))])
+
+
+def aggregate_tables(gold_dir: Path) -> dict[str, list[tuple]]:
+    with duckdb.connect(str(gold_dir / f"{db_name}.duckdb"), read_only=True) as con:
+        names = con.execute(
+            "select table_name from information_schema.tables "
+            "where table_name like 'agg\\_%' escape '\\' order by 1"
+        ).fetchall()
+        return {name: sorted(con.table(name).fetchall()) for (name,) in names}
+
+
+@pytest.fixture
+def layers(tmp_path: Path) -> dict[str, Path]:
+    layers = {name: tmp_path / name for name in ["bronze", "silver", "gold"]}
+    shutil.copytree(bronze_dir, layers["bronze"])
+    return layers
+
+
+def test_append_matches_full_rebuild(layers: dict[str, Path], tmp_path: Path):
+    """The last editions catalogued later are appended as a full rebuild would load them."""
+    write_insertions(
+        layers["bronze"] / insertions_file,
+        lambda row: not (row[1] == "1884" and int(row[2]) >= 300),
+    )
+    run_pipeline(layers["bronze"], layers["silver"], layers["gold"], force=True)
+    shutil.copy(bronze_dir / insertions_file, layers["bronze"] / insertions_file)
+
+    assert append_veiculacoes(layers["bronze"], layers["silver"], layers["gold"]) > 0
+    assert run_pipeline(layers["bronze"], layers["silver"], layers["gold"]) == []
+
+    full_silver, full_gold = tmp_path / "full_silver", tmp_path / "full_gold"
+    run_pipeline(layers["bronze"], full_silver, full_gold, force=True)
+    appended = aggregate_tables(layers["gold"])
+    assert appended.keys() == {
+        "agg_edicoes",
+        "agg_indicadores",
+        "agg_paginas",
+        "agg_propriedades",
+    }
+    assert appended == aggregate_tables(full_gold)
+    assert pl.read_parquet(layers["silver"] / "veiculacoes.parquet").equals(
+        pl.read_parquet(full_silver / "veiculacoes.parquet")
+    )
+
+
+def test_append_defers_late_rows_to_full_pipeline(layers: dict[str, Path]):
+    """A row catalogued below the watermark cannot be appended."""
+    write_insertions(
+        layers["bronze"] / insertions_file,
+        lambda row: row[:4] != ["molestias_da_pelle", "1882", "286", "4"],
+    )
+    run_pipeline(layers["bronze"], layers["silver"], layers["gold"], force=True)
+    shutil.copy(bronze_dir / insertions_file, layers["bronze"] / insertions_file)
+
+    assert (
+        append_veiculacoes(layers["bronze"], layers["silver"], layers["gold"]) is None
+    )